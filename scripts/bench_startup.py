@@ -0,0 +1,79 @@
+"""
+Guard the startup time of the commands that do not capture.
+
+Runs each case in a fresh interpreter several times and compares the best
+wall time against its budget. GStreamer is loaded lazily (see
+``photon_platform.capture.gst``), so none of these cases may import ``gi``;
+either regression makes the script exit with status 1.
+
+    python scripts/bench_startup.py --runs 10
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+# best-of-N wall time budget in milliseconds, interpreter start included
+CASES = {
+    "import photon_platform.capture": ([], 150),
+    "capt --help": (["--help"], 400),
+    "capt reprocess --help": (["reprocess", "--help"], 400),
+    "capt rough-cut --help": (["rough-cut", "--help"], 400),
+    "capt workflow --list": (["workflow", "--list"], 450),
+}
+
+CHILD = """
+import sys
+argv = {argv!r}
+if argv:
+    from photon_platform.capture.main import main
+    try:
+        main(argv)
+    except SystemExit:
+        pass
+else:
+    import photon_platform.capture
+sys.stderr.write("gi loaded\\n" if "gi" in sys.modules else "")
+"""
+
+
+def time_case(argv: list, runs: int):
+    """
+    Best wall time in milliseconds over ``runs``, and whether ``gi`` was
+    imported in any of them.
+    """
+    best, gi_loaded = float("inf"), False
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD.format(argv=argv)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        best = min(best, (time.perf_counter() - start) * 1000)
+        gi_loaded = gi_loaded or "gi loaded" in result.stderr
+    return best, gi_loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiply every budget, for slow machines."
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for name, (argv, budget) in CASES.items():
+        elapsed, gi_loaded = time_case(argv, args.runs)
+        budget *= args.scale
+        status = "ok"
+        if gi_loaded:
+            status = "FAIL: imports gi"
+        elif elapsed > budget:
+            status = "FAIL: over budget"
+        failed = failed or status != "ok"
+        print(f"{name:>28}: {elapsed:7.1f} ms (budget {budget:.0f} ms)  {status}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,69 @@
+"""
+Compare time-to-MLT for offline and live mic cleaning.
+
+Records a session from the test sources for a fixed duration in each mode and
+measures the time from stopping the recording to the MLT file being written.
+
+    python scripts/bench_time_to_mlt.py --seconds 60
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from photon_platform.capture import gst
+from photon_platform.capture.capture import (
+    configure_session_pipeline,
+    clean_audio_path,
+    clean_mic_audio,
+    LIVE_CLEAN_ELEMENTS,
+    start_live_clean,
+    isolate_live_clean,
+    finish_live_clean,
+)
+from photon_platform.capture.mlt_generator import generate_mlt_file
+from photon_platform.capture.shutdown import ShutdownCoordinator
+
+
+def record(folder: Path, seconds: float, live: bool):
+    mic_file = folder / "mic.ogg"
+    mic_clean_file = clean_audio_path(mic_file)
+    cleaner = start_live_clean(mic_clean_file) if live else None
+
+    pipeline = configure_session_pipeline(
+        mic_file, folder / "screen.mkv", folder / "system.ogg",
+        test_sources=True,
+        mic_clean_fd=cleaner[1] if cleaner else None,
+    )
+    loop = gst.GLib.MainLoop()
+    coordinator = ShutdownCoordinator([pipeline], loop, optional=LIVE_CLEAN_ELEMENTS if live else ())
+    coordinator.watch()
+    if live:
+        isolate_live_clean(pipeline)
+    gst.GLib.timeout_add(int(seconds * 1000), loop.quit)
+    pipeline.set_state(gst.Gst.State.PLAYING)
+    loop.run()
+
+    stopped = time.perf_counter()
+    coordinator.stop()
+    if cleaner:
+        finish_live_clean(*cleaner)
+    else:
+        clean_mic_audio(mic_file)
+    generate_mlt_file(mic_clean_file, folder / "bench.mlt")
+    return time.perf_counter() - stopped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, live in (("offline", False), ("live", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            results[mode] = record(Path(tmp), args.seconds, live)
+
+    print(f"\nrecording length: {args.seconds:.0f}s")
+    for mode, elapsed in results.items():
+        print(f"{mode:>8}: {elapsed:6.2f}s stop -> MLT")
@@ -0,0 +1,69 @@
+"""
+Time the transcript index on a long synthetic transcript.
+
+Writes the word timings of ``--hours`` of speech (about 2.5 words a second
+with a pause every dozen words), then times building the index, phrase
+searches and time lookups.
+
+    python scripts/bench_transcript_index.py --hours 11
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from photon_platform.capture.transcribe import RATE, transcript_paths
+from photon_platform.capture.transcript_index import TranscriptIndex, build_index
+
+VOCABULARY = (
+    "the a we you it this that so and but if when now here there then what how "
+    "capture session record screen audio clean render cut track frame don't can't it's"
+).split()
+
+
+def write_transcript(audio_file: Path, hours: float, seed=0):
+    rng = random.Random(seed)
+    words, t = [], 0.0
+    while t < hours * 3600:
+        for _ in range(12):
+            words.append({"word": rng.choice(VOCABULARY), "start": t, "end": t + 0.3, "conf": 1.0})
+            t += 0.4
+        t += 1.0
+    transcript_paths(audio_file)["words"].write_text(
+        json.dumps({"rate": RATE, "segments": [{"words": words}]})
+    )
+    return len(words)
+
+
+def best_ms(function, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hours", type=float, default=11.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_file = Path(tmp) / "mic_clean.ogg"
+        count = write_transcript(audio_file, args.hours)
+        print(f"{count} words over {args.hours:g} hours")
+        print(f"{'build':>14}: {best_ms(lambda: build_index(audio_file), 1):8.1f} ms")
+        with TranscriptIndex(audio_file) as index:
+            middle = args.hours * 1800
+            cases = {
+                "search": lambda: index.search("render cut"),
+                "search 1": lambda: index.search("don't capture", limit=1),
+                "at": lambda: index.at(middle),
+                "sentences": lambda: index.sentences(middle, middle + 60),
+            }
+            for name, function in cases.items():
+                print(f"{name:>14}: {best_ms(function, args.runs):8.1f} ms")
@@ -1,11 +1,12 @@
 import subprocess
-import re
+
+from photon_platform.capture.devices import DeviceRegistry
 
 def get_source_identifier(partial_match_string):
     """
-    Finds the full name or index of an input source matching a partial string
-    in its Name, Description, or certain device properties.
-    Prefers returning the full name if found, as it's more stable.
+    Finds the full name of an input source matching a partial string in its
+    name, description or product name, through the package's device
+    registry instead of parsing `pactl list sources`.
 
     Args:
         partial_match_string (str): A substring to match (case-insensitive)
@@ -13,62 +14,13 @@ def get_source_identifier(partial_match_string):
                                     e.g., "Scarlett", "Focusrite", "Analog Input - Scarlett"
 
     Returns:
-        str or None: The full name (preferred) or index of the matching source,
-                     or None if not found.
+        str or None: The full name of the matching source, or None if not found.
     """
     try:
-        result = subprocess.run(['pactl', 'list', 'sources'], capture_output=True, text=True, check=True)
-        sources_output = result.stdout
-        
-        source_blocks = sources_output.split("Source #")
-        
-        for block_content in source_blocks:
-            if not block_content.strip():
-                continue
-
-            current_block = "Source #" + block_content # For easier parsing of individual source details
-            
-            source_index_match = re.search(r"^Source #(\d+)", current_block, re.MULTILINE)
-            source_name_match = re.search(r"^\s*Name: (.+)", current_block, re.MULTILINE)
-            source_description_match = re.search(r"^\s*Description: (.+)", current_block, re.MULTILINE)
-            properties_dev_desc_match = re.search(r"device.description = \"([^\"]+)\"", current_block)
-            properties_prod_name_match = re.search(r"device.product.name = \"([^\"]+)\"", current_block)
-
-            current_source_index = source_index_match.group(1) if source_index_match else None
-            current_source_name = source_name_match.group(1).strip() if source_name_match else None
-            current_source_description = source_description_match.group(1).strip() if source_description_match else None
-            prop_dev_desc = properties_dev_desc_match.group(1).strip() if properties_dev_desc_match else ""
-            prop_prod_name = properties_prod_name_match.group(1).strip() if properties_prod_name_match else ""
-            
-            identifier_to_return = None
-
-            # Check for match in Name (often like alsa_input.usb-Focusrite_Scarlett...)
-            if current_source_name and partial_match_string.lower() in current_source_name.lower():
-                identifier_to_return = current_source_name
-
-            # Check for match in Description (often more user-friendly like "Scarlett 2i2 Analog Stereo")
-            elif current_source_description and partial_match_string.lower() in current_source_description.lower():
-                identifier_to_return = current_source_name if current_source_name else current_source_index
-            
-            # Check for match in device.description property
-            elif prop_dev_desc and partial_match_string.lower() in prop_dev_desc.lower():
-                identifier_to_return = current_source_name if current_source_name else current_source_index
-
-            # Check for match in device.product.name property
-            elif prop_prod_name and partial_match_string.lower() in prop_prod_name.lower():
-                identifier_to_return = current_source_name if current_source_name else current_source_index
-
-            if identifier_to_return:
-                # print(f"Debug: Matched Source #{current_source_index}, Name: {current_source_name}, Desc: {current_source_description}, Identifier: {identifier_to_return}")
-                return identifier_to_return
-                
-    except FileNotFoundError:
-        print("Error: pactl command not found. Is PulseAudio or pipewire-pulse installed and in your PATH?")
-        return None
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing 'pactl list sources': {e.stderr}")
+        return DeviceRegistry().resolve(partial_match_string, monitor=False).name
+    except ValueError as e:
+        print(f"Error: {e}")
         return None
-    return None
 
 def set_input_volume(source_identifier, volume_percent_str):
     """
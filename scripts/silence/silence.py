@@ -6,6 +6,8 @@ import subprocess
 from pathlib import Path
 import xml.etree.ElementTree as ET
 
+from photon_platform.capture.silence import detect_speech
+
 
 def read_videoframerate(video_path) -> float:
     """TODO: Docstring for read_videoframerate.
@@ -169,9 +171,8 @@ if __name__ == "__main__":
     if not Path(media_file).exists():
         print(f"File not found: {media_file}")
     else:
-        # Parsing the silence log file
-        silence_pairs = detect_silence_ffmpeg(media_file)
-        clips = get_clips(silence_pairs)
+        # one decode, NumPy envelope: closed segments, no silencedetect scraping
+        clips = detect_speech(media_file, noise_floor=-30.0, min_silence=2.0)
         print(clips)
         combine_to_xml(clips, media_file)
 
@@ -1,6 +1,6 @@
 """The package entry point into the application."""
 
-from .app import run
+from .main import main
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    main()
@@ -0,0 +1,137 @@
+"""
+Content-addressed cache for ffmpeg stages.
+
+A stage's key is the ffmpeg argument list with every input path replaced by
+the input's content hash and the output path by a placeholder, so the same
+work on the same media hits the cache wherever the session folder lives.
+Outputs are stored under ``~/.cache/photon-capture/stages`` and hard-linked
+(or copied across filesystems) back into the session. The least recently
+used entries are evicted once the cache grows past its size cap; use is
+tracked in the access time, since a hard-linked entry shares its
+modification time with the session file.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import time
+
+from .probe import media_hash
+
+CACHE_DIR = Path(
+    os.environ.get("CAPTURE_CACHE_DIR")
+    or Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "photon-capture" / "stages"
+)
+DEFAULT_MAX_BYTES = int(float(os.environ.get("CAPTURE_CACHE_MAX_GB", 20)) * 1024**3)
+
+settings = {
+    "enabled": True,
+    "force": False,
+    "max_bytes": DEFAULT_MAX_BYTES,
+    "dir": CACHE_DIR,
+}
+
+
+def configure(**options):
+    """
+    Change the cache ``settings``, e.g. ``configure(force=True)`` from the CLI.
+    """
+    unknown = set(options) - set(settings)
+    if unknown:
+        raise ValueError(f"unknown cache settings: {', '.join(sorted(unknown))}")
+    settings.update(options)
+
+
+def stage_key(command, inputs, output) -> str:
+    """
+    Key for running ``command`` on ``inputs`` to produce ``output``.
+
+    Inputs read indirectly, such as the segments behind a concat manifest,
+    are not in the arguments; their hashes are appended in order.
+    """
+    placeholders = {str(path): f"<input:{media_hash(path)}>" for path in inputs}
+    placeholders[str(output)] = f"<output{Path(output).suffix}>"
+    args = [placeholders.get(str(arg), str(arg)) for arg in command]
+    named = set(map(str, command))
+    args += [placeholders[str(path)] for path in inputs if str(path) not in named]
+    return hashlib.sha256(json.dumps(args).encode()).hexdigest()
+
+
+def _link_or_copy(source: Path, target: Path):
+    tmp = target.with_name(target.name + f".{os.getpid()}.tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copy2(source, tmp)
+    os.replace(tmp, target)
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _touch(entry: Path):
+    """
+    Mark ``entry`` as recently used. Only the access time changes: the
+    modification time is shared with the hard-linked session file and keys
+    its probe and envelope caches.
+    """
+    stat = entry.stat()
+    os.utime(entry, ns=(time.time_ns(), stat.st_mtime_ns))
+
+
+def evict(max_bytes=None):
+    """
+    Delete the least recently used entries until the cache fits ``max_bytes``.
+    """
+    max_bytes = settings["max_bytes"] if max_bytes is None else max_bytes
+    entries = []
+    for path in Path(settings["dir"]).glob("*/*"):
+        if path.name.endswith(".tmp"):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # evicted by another worker
+        entries.append((stat.st_atime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def run_cached(command, inputs, output) -> Path:
+    """
+    Run the ffmpeg ``command`` unless a cached result for the same inputs
+    and arguments exists, in which case that result is linked to ``output``.
+
+    ``settings["force"]`` re-runs the command and refreshes the entry.
+    """
+    output = Path(output)
+    if not settings["enabled"]:
+        subprocess.run(command, check=True)
+        return output
+
+    key = stage_key(command, inputs, output)
+    entry = Path(settings["dir"]) / key[:2] / (key + output.suffix)
+    if entry.exists() and not settings["force"]:
+        _link_or_copy(entry, output)
+        _touch(entry)
+        print(f"Reusing cached {output.name}")
+        return output
+
+    # never let ffmpeg truncate an inode shared with a cache entry
+    _remove(output)
+    subprocess.run(command, check=True)
+
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    _link_or_copy(output, entry)
+    evict()
+    return output
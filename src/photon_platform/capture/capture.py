@@ -1,18 +1,39 @@
-import gi
+import os
 import subprocess
 from pathlib import Path
 import time
 import re
 
-gi.require_version("Gst", "1.0")
-from gi.repository import Gst, GLib
+from .cache import run_cached
+from .composite import waves_layout
+from .encoders import DEFAULT_ENCODER, get_encoder
+from .layout import render_layout
+from .mlt_generator import proxy_path
+from .preroll import preroll_queue
+from .probe import media_info, stream_codecs
+from .screen import DEFAULT_SCREEN, ScreenOptions, proxy_size
+from .segments import ffmpeg_input, is_manifest, segment_pattern, source_files
 
-Gst.init(None)
+from . import gst
 
-DEFAULT_MIC = "alsa_input.usb-BLUE_MICROPHONE_Blue_Snowball_201305-00.analog-stereo"
+# pulse source names, or fuzzy queries resolved by devices.DeviceRegistry
 DEFAULT_MIC = "alsa_output.usb-Focusrite_Scarlett_2i2_4th_Gen_S2NYNAU3C96D20-00.analog-surround-40"
 DEFAULT_SYSTEM_AUDIO = "alsa_output.pci-0000_0a_00.6.analog-stereo.monitor"
 
+MIC_CLEAN_FILTERS = (
+    'afftdn=nr=40:nt=w,'
+    'equalizer=f=300:width=100:gain=3:f=5000:width=200:gain=3,'
+    'acompressor=threshold=-21dB:ratio=9:attack=200:release=1000'
+)
+# PCM handed from the capture pipeline to the live cleaning process; the
+# channels are the mic's own, as in the recorded file the offline clean reads
+LIVE_CLEAN_RATE = 48000
+LIVE_CLEAN_TIMEOUT = 30.0  # seconds the cleaner gets to finish after EOS
+# the live-clean branch, whose errors must not stop the recording
+LIVE_CLEAN_ELEMENTS = ("mic_clean_queue", "mic_clean_sink")
+# cheap edit proxy teed off the screen branch while recording
+PROXY_ENCODER = "x264enc tune=zerolatency speed-preset=ultrafast bitrate=800 key-int-max=25"
+
 
 def display_elapsed_time(start_time, stop_event):
     while not stop_event.is_set():
@@ -34,73 +55,385 @@ def slugify(value):
     return value
 
 
+def mic_source(device=DEFAULT_MIC, test=False):
+    """
+    Launch fragment for the microphone source.
+
+    With ``test`` set an ``audiotestsrc`` stands in for the device so the
+    pipelines can run headless.
+    """
+    if test:
+        return "audiotestsrc is-live=true wave=sine freq=440"
+    return f"pulsesrc device={device}"
+
+
+def system_audio_source(device=DEFAULT_SYSTEM_AUDIO, test=False):
+    """
+    Launch fragment for the system audio monitor source.
+    """
+    if test:
+        return "audiotestsrc is-live=true wave=ticks"
+    return f"pulsesrc device={device}"
+
+
+def screen_source(test=False, screen: ScreenOptions = DEFAULT_SCREEN):
+    """
+    Launch fragment for the screen source: the region or window of
+    ``screen``, delivered at exactly ``screen.fps``.
+
+    ``ximagesrc`` is asked for that rate and ``videorate`` holds it there,
+    duplicating frames the grabber missed, so the encoder sees a constant
+    rate. With ``use_damage`` only the changed parts of the screen are
+    copied each frame, which is cheap for mostly static screens.
+    """
+    rate = f"framerate={screen.fps}/1"
+    if test:
+        width, height = screen.size or (1920, 1080)
+        return (
+            "videotestsrc is-live=true pattern=smpte ! "
+            f"video/x-raw,width={width},height={height},{rate}"
+        )
+    if screen.window_id is not None:
+        area = f"xid={screen.window_id}"
+    else:
+        x, y, width, height = screen.region
+        area = f"startx={x} starty={y} endx={x + width - 1} endy={y + height - 1}"
+    return (
+        f"ximagesrc use-damage={int(screen.use_damage)} {area} ! "
+        f"video/x-raw,{rate} ! videorate ! video/x-raw,{rate}"
+    )
+
+
+def file_sink(output_file: Path, muxer: str, segment_time=0, segment_bytes=0, kind="audio"):
+    """
+    Launch fragment muxing an encoded stream into ``output_file``.
+
+    With ``segment_time`` (seconds) or ``segment_bytes`` set, the stream is
+    split by a ``splitmuxsink`` named ``<stem>_split`` into rolling segments
+    instead, see :mod:`segments`. Video segments start on a requested
+    keyframe so each one decodes on its own.
+    """
+    if not (segment_time or segment_bytes):
+        return f"{muxer} ! filesink location={str(output_file)}"
+    name = f"{Path(output_file).stem}_split"
+    pad = "video" if kind == "video" else "audio_0"
+    keyframes = " send-keyframe-requests=true" if kind == "video" and segment_time else ""
+    return (
+        f"{name}.{pad} splitmuxsink name={name} muxer-factory={muxer} "
+        f"location={str(segment_pattern(output_file))} "
+        f"max-size-time={int(segment_time * gst.Gst.SECOND)} max-size-bytes={int(segment_bytes)}{keyframes}"
+    )
+
+
 #  pulsesrc device=alsa_input.usb-Focusrite_Scarlett_2i2_4th_Gen_S2NYNAU3C96D20-00.analog-surround-40 ! audioconvert ! audioresample ! wavenc ! filesink location=output.wav
 def configure_mic_pipeline(output_file: Path, device=DEFAULT_MIC):
     pipeline_cmd = (
-        f"pulsesrc device={device} ! "
+        f"{mic_source(device)} ! "
         f"volume volume=1.5 ! "
         f"audioconvert ! opusenc ! oggmux ! "
         f"filesink location={str(output_file)}"
     )
-    return Gst.parse_launch(pipeline_cmd)
+    return gst.Gst.parse_launch(pipeline_cmd)
 
-def configure_screen_pipeline(output_file: Path):
+def configure_screen_pipeline(output_file: Path, encoder=DEFAULT_ENCODER, screen=DEFAULT_SCREEN):
     pipeline_cmd = (
-        f"ximagesrc use-damage=0 startx=0 starty=768 endx=1919 endy=1847 ! "
-        f"videoconvert ! vp8enc cpu-used=4 target-bitrate=2000000 ! matroskamux ! "
+        f"{screen_source(screen=screen)} ! "
+        f"videoconvert ! {get_encoder(encoder).encoder} ! matroskamux ! "
         f"filesink location={str(output_file)}"
     )
-    return Gst.parse_launch(pipeline_cmd)
+    return gst.Gst.parse_launch(pipeline_cmd)
 
 def configure_system_audio_pipeline(output_file: Path, device=DEFAULT_SYSTEM_AUDIO):
     pipeline_cmd = (
-        f"pulsesrc device={device} ! "
+        f"{system_audio_source(device)} ! "
         f"volume volume=0.7 ! "
         f"audioconvert ! opusenc ! oggmux ! "
         f"filesink location={str(output_file)}"
     )
-    return Gst.parse_launch(pipeline_cmd)
+    return gst.Gst.parse_launch(pipeline_cmd)
 
-def configure_system_screen_audio_pipeline(output_file: Path, audio_device=DEFAULT_SYSTEM_AUDIO):
+def configure_system_screen_audio_pipeline(output_file: Path, audio_device=DEFAULT_SYSTEM_AUDIO, encoder=DEFAULT_ENCODER, screen=DEFAULT_SCREEN):
     pipeline_cmd = (
-        f"ximagesrc use-damage=0 startx=0 starty=768 endx=1919 endy=1847 ! "
-        f"videoconvert ! vp8enc cpu-used=4 target-bitrate=2000000 ! queue ! mux. "
-        f"pulsesrc device={audio_device} ! audioconvert ! opusenc ! queue ! mux. "
+        f"{screen_source(screen=screen)} ! "
+        f"videoconvert ! {get_encoder(encoder).encoder} ! queue ! mux. "
+        f"{system_audio_source(audio_device)} ! audioconvert ! opusenc ! queue ! mux. "
         f"matroskamux name=mux ! filesink location={str(output_file)}"
     )
-    return Gst.parse_launch(pipeline_cmd)
+    return gst.Gst.parse_launch(pipeline_cmd)
 
-def clean_mic_audio(input_audio: Path) -> Path:
+def configure_session_pipeline(
+    mic_file: Path,
+    screen_file: Path,
+    system_file: Path,
+    mic_device=DEFAULT_MIC,
+    system_device=DEFAULT_SYSTEM_AUDIO,
+    test_sources=False,
+    mic_clean_fd=None,
+    encoder=DEFAULT_ENCODER,
+    proxy_file: Path = None,
+    segment_time=0,
+    segment_bytes=0,
+    preroll=0,
+    screen: ScreenOptions = DEFAULT_SCREEN,
+):
+    """
+    Build one pipeline that records the mic, screen and system audio.
+
+    Every branch runs on the same pipeline clock and base time, so the
+    timestamps written to ``mic_file``, ``screen_file`` and ``system_file``
+    are directly comparable and the tracks can later be stream-copied
+    together instead of re-aligned by a re-encode.
+
+    Set ``test_sources`` to swap the devices for ``audiotestsrc`` and
+    ``videotestsrc`` so the engine can run without a display or sound
+    server.
+
+    With ``mic_clean_fd`` the mic is also teed as raw PCM into that file
+    descriptor, see :func:`start_live_clean`. ``encoder`` names a preset
+    from :data:`encoders.ENCODER_PRESETS`; ``screen`` picks the region or
+    window and the frame rate, see :func:`screen_source`.
+
+    With ``proxy_file`` the screen is also teed through a leaky queue into a
+    480p x264 file for editing, see :func:`make_proxy`.
+
+    The audio branches carry ``level`` elements and the encoder queue is
+    named ``screen_queue`` for :mod:`telemetry`.
+
+    ``segment_time`` and ``segment_bytes`` record the mic, screen and system
+    files as rolling segments, see :func:`file_sink`.
+
+    ``preroll`` seconds adds the ring buffers of an armed capture, see
+    :class:`preroll.Preroll`.
+    """
+    segmenting = {"segment_time": segment_time, "segment_bytes": segment_bytes}
+
+    def ring(name):
+        return preroll_queue(name, preroll) if preroll else ""
+
+    mic_branch = (
+        f"{mic_source(mic_device, test_sources)} ! queue ! "
+        f"volume volume=1.5 ! audioconvert ! level name=mic_level ! {ring('mic_preroll')}"
+    )
+    if mic_clean_fd is not None:
+        # leaky, so a slow cleaner loses live-clean audio, never mic audio;
+        # see isolate_live_clean for a dead one
+        mic_branch += (
+            f"tee name=mic_tee "
+            f"mic_tee. ! queue name=mic_clean_queue leaky=downstream "
+            f"max-size-time=10000000000 max-size-buffers=0 max-size-bytes=0 ! "
+            f"audioconvert ! audioresample ! "
+            f"audio/x-raw,format=S16LE,rate={LIVE_CLEAN_RATE} ! "
+            f"matroskamux streamable=true ! "
+            f"fdsink name=mic_clean_sink fd={mic_clean_fd} sync=false "
+            f"mic_tee. ! queue ! "
+        )
+    screen_branch = f"{screen_source(test_sources, screen)} ! "
+    if proxy_file is not None:
+        # leaky, so a busy proxy encoder drops proxy frames, never master frames
+        width, height = proxy_size(screen)
+        screen_branch += (
+            f"queue ! tee name=screen_tee "
+            f"screen_tee. ! queue leaky=downstream max-size-buffers=25 max-size-time=0 max-size-bytes=0 ! "
+            f"videoscale ! videoconvert ! video/x-raw,width={width},height={height},format=I420 ! "
+            f"{PROXY_ENCODER} ! {ring('proxy_preroll')}matroskamux ! "
+            f"filesink location={str(proxy_file)} "
+            f"screen_tee. ! "
+        )
+    # the queue feeding the encoder; its fill level is the encoder backlog
+    screen_branch += "queue name=screen_queue ! "
+    pipeline_cmd = (
+        f"{mic_branch}"
+        f"opusenc ! {file_sink(mic_file, 'oggmux', **segmenting)} "
+        f"{screen_branch}"
+        f"videoconvert ! {get_encoder(encoder).encoder} ! {ring('screen_preroll')}"
+        f"{file_sink(screen_file, 'matroskamux', kind='video', **segmenting)} "
+        f"{system_audio_source(system_device, test_sources)} ! queue ! "
+        f"volume volume=0.7 ! "
+        f"audioconvert ! level name=system_level ! {ring('system_preroll')}"
+        f"opusenc ! {file_sink(system_file, 'oggmux', **segmenting)}"
+    )
+    return gst.Gst.parse_launch(pipeline_cmd)
+
+def clean_audio_path(input_audio: Path) -> Path:
     #  output_audio = input_audio.with_suffix("_clean.ogg")
-    output_audio = input_audio.with_name(input_audio.stem + "_clean" + input_audio.suffix)
+    # a segmented recording cleans into one ogg file
+    suffix = source_files(input_audio)[0].suffix if is_manifest(input_audio) else input_audio.suffix
+    return input_audio.with_name(input_audio.stem + "_clean" + suffix)
+
+def clean_mic_audio(input_audio: Path) -> Path:
+    output_audio = clean_audio_path(input_audio)
 
     command = [
-        'ffmpeg', '-y', '-i', str(input_audio),
-        '-af', 'afftdn=nr=40:nt=w,equalizer=f=300:width=100:gain=3:f=5000:width=200:gain=3,acompressor=threshold=-21dB:ratio=9:attack=200:release=1000',
+        'ffmpeg', '-y', *ffmpeg_input(input_audio),
+        '-af', MIC_CLEAN_FILTERS,
         str(output_audio)
     ]
-    subprocess.run(command)
+    run_cached(command, [input_audio, *source_files(input_audio)], output_audio)
     return output_audio
 
-def combine_video_system_audio(video_file: Path, audio_file: Path, output_file: Path):
+def start_live_clean(output_audio: Path):
+    """
+    Start an ffmpeg process applying the :func:`clean_mic_audio` filter chain
+    to the mic as it is recorded.
+
+    The PCM arrives in a streamable Matroska wrapper, which carries the mic's
+    channel count and layout, so the live clean has the same channels and
+    level as the offline clean of ``mic.ogg``.
+
+    Returns the process and the write end of its input pipe, which is handed
+    to :func:`configure_session_pipeline` as ``mic_clean_fd``.
+    """
+    read_fd, write_fd = os.pipe()
     command = [
-        "ffmpeg",
-        "-i",
-        str(video_file),
-        "-i",
-        str(audio_file),
-        "-c:v",
-        "libx264",
-        "-crf",
-        "23",
-        "-preset",
-        "veryfast",
-        "-c:a",
-        "copy",
-        "-shortest",
-        str(output_file),
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'matroska', '-i', 'pipe:0',
+        '-af', MIC_CLEAN_FILTERS,
+        str(output_audio)
     ]
-    subprocess.run(command)
+    process = subprocess.Popen(command, stdin=read_fd)
+    os.close(read_fd)
+    return process, write_fd
+
+def isolate_live_clean(pipeline) -> dict:
+    """
+    Keep the live cleaner of ``pipeline`` from stopping the recording.
+
+    Once ``mic_clean_sink`` fails, e.g. with EPIPE after ffmpeg died, mic
+    buffers are dropped in front of ``mic_clean_queue`` so the error never
+    flows back through the tee. The failure is caught from the streaming
+    thread, before the queue passes the error upstream.
+
+    Returns a dict whose ``lost`` entry turns True when the sink failed or
+    the leaky queue dropped audio: the live clean is incomplete and the mic
+    has to be cleaned offline.
+    """
+    state = {"failed": False, "lost": False}
+    sink = pipeline.get_by_name("mic_clean_sink")
+    queue = pipeline.get_by_name("mic_clean_queue")
+
+    def on_error(bus, message):
+        if message.src == sink:
+            state.update(failed=True, lost=True)
+
+    def drop_after_failure(pad, info):
+        if state["failed"]:
+            return gst.Gst.PadProbeReturn.DROP
+        return gst.Gst.PadProbeReturn.OK
+
+    bus = pipeline.get_bus()
+    bus.enable_sync_message_emission()
+    bus.connect("sync-message::error", on_error)
+    queue.get_static_pad("sink").add_probe(gst.Gst.PadProbeType.BUFFER, drop_after_failure)
+    queue.connect("overrun", lambda queue: state.update(lost=True))
+    return state
+
+def finish_live_clean(process, write_fd, timeout=LIVE_CLEAN_TIMEOUT) -> int:
+    """
+    Close the live cleaner's input and wait for it to finish the file.
+
+    Call after the capture pipeline has reached EOS. A cleaner still running
+    after ``timeout`` seconds is killed. Returns the ffmpeg exit code, which
+    is negative when it was killed.
+    """
+    os.close(write_fd)
+    try:
+        return process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        print(f"WARNING: live mic cleaning did not finish within {timeout}s; killing it.")
+        process.kill()
+        return process.wait()
+
+# codecs each target container carries as-is for Shotcut/melt
+COPY_CODECS = {
+    ".mkv": {"vp8", "vp9", "av1", "h264", "hevc", "opus", "vorbis", "aac", "flac"},
+    ".mp4": {"h264", "hevc", "av1", "aac", "mp3", "opus"},
+}
+MUX_MODES = ("auto", "copy", "transcode")
+
+def choose_mux_mode(video_file: Path, audio_file: Path, output_file: Path) -> str:
+    """
+    Probe the inputs and return ``copy`` when every stream can go into the
+    output container untouched, otherwise ``transcode``.
+    """
+    allowed = COPY_CODECS.get(output_file.suffix.lower(), set())
+    # every segment of a segmented recording shares the first one's codecs
+    video_codecs = stream_codecs(media_info(source_files(video_file)[0])["probe"], "video")
+    audio_codecs = stream_codecs(media_info(source_files(audio_file)[0])["probe"], "audio")
+    if not video_codecs or not audio_codecs:
+        return "transcode"
+    if set(video_codecs[:1] + audio_codecs[:1]) <= allowed:
+        return "copy"
+    return "transcode"
+
+def combine_video_system_audio(video_file: Path, audio_file: Path, output_file: Path, mode="auto"):
+    """
+    Attach the system audio to the screen video.
+
+    The capture pipeline timestamps both files on one clock, so in ``copy``
+    mode the streams are remuxed as they are; ``transcode`` re-encodes the
+    video to x264 for targets that cannot hold the captured codec. ``auto``
+    picks between them with :func:`choose_mux_mode`.
+    """
+    if mode == "auto":
+        mode = choose_mux_mode(video_file, audio_file, output_file)
+
+    if mode == "copy":
+        command = [
+            "ffmpeg",
+            "-y",
+            *ffmpeg_input(video_file),
+            *ffmpeg_input(audio_file),
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a:0",
+            "-c",
+            "copy",
+            "-shortest",
+            str(output_file),
+        ]
+    else:
+        command = [
+            "ffmpeg",
+            "-y",
+            *ffmpeg_input(video_file),
+            *ffmpeg_input(audio_file),
+            "-c:v",
+            "libx264",
+            "-crf",
+            "23",
+            "-preset",
+            "veryfast",
+            "-c:a",
+            "copy",
+            "-shortest",
+            str(output_file),
+        ]
+    inputs = [video_file, audio_file, *source_files(video_file), *source_files(audio_file)]
+    run_cached(command, inputs, output_file)
+    return output_file
+
+def make_proxy(proxy_video: Path, audio_file: Path, media_file: Path) -> Path:
+    """
+    Remux the proxy recorded alongside ``media_file`` with ``audio_file``
+    into Shotcut's proxy location for ``media_file``.
+
+    The video is copied as recorded; only the audio is encoded, to AAC for
+    the mp4.
+    """
+    output_file = proxy_path(media_file)
+    output_file.parent.mkdir(exist_ok=True)
+    command = [
+        'ffmpeg', '-y',
+        '-i', str(proxy_video),
+        *ffmpeg_input(audio_file),
+        '-map', '0:v:0', '-map', '1:a:0',
+        '-c:v', 'copy',
+        '-c:a', 'aac', '-b:a', '96k',
+        '-shortest', '-movflags', '+faststart',
+        str(output_file)
+    ]
+    run_cached(command, [proxy_video, audio_file, *source_files(audio_file)], output_file)
     return output_file
 
 def invert_video_colors(input_file: Path) -> Path:
@@ -112,7 +445,7 @@ def invert_video_colors(input_file: Path) -> Path:
         '-vf', 'negate',
         str(output_file)
     ]
-    subprocess.run(command)
+    run_cached(command, [input_file], output_file)
     return output_file
 
 def combine_all(folder_name: Path, screen_system_file: Path, mic_file: Path) -> Path:
@@ -134,95 +467,32 @@ def combine_all(folder_name: Path, screen_system_file: Path, mic_file: Path) ->
         '-b:a', '128k',                 # Bitrate for the audio
         str(output_file)                # Output file
     ]
-    subprocess.run(command)
+    run_cached(command, [screen_system_file, mic_file], output_file)
     return output_file
 
 def generate_waveform(input_audio: Path, color="Blue") -> Path:
     #  output = input_audio.with_suffix("_waves.mp4")
     output = input_audio.with_name(input_audio.stem + "_waves.mp4")  # Updated line
 
-    subprocess.run([
+    run_cached([
         'ffmpeg', '-y', '-i', str(input_audio),
         '-filter_complex', f'showwaves=s=200x400:mode=cline:colors={color},crop=200:200',
         '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
         str(output)
-    ])
+    ], [input_audio], output)
     return output
 
 def combine_screen_waves_2(output_file: Path, screen_file: Path, mic_waves: Path, system_waves: Path) -> Path:
-    margin = 30
-    wave_size = 100
-
-    # Use Path(__file__).parent to locate circle_mask.png relative to this script
-    circle_mask_path = Path(__file__).parent / "circle_mask.png" # Ensure this path is correct
-
-    # Calculate new height for the screen video
-    output_resolution = (1920, 1080)
-    new_height = output_resolution[1] - 3 * margin - wave_size
-    # Calculate new width while maintaining the aspect ratio
-    aspect_ratio = 16 / 9
-    new_width = int(new_height * aspect_ratio)
-
-    # NOTE: the system and mic waves have been switched so the filter names are opposite
-    subprocess.run([
-        'ffmpeg', '-y',
-        '-i', str(screen_file),
-        '-i', str(system_waves),
-        '-i', str(mic_waves),
-        '-i', str(circle_mask_path),
-        '-filter_complex',
-        f'[1:v]scale={wave_size}x{wave_size},format=yuva420p[mic_waves];' + 
-        f'[2:v]scale={wave_size}x{wave_size},format=yuva420p[sys_waves];' + 
-        '[mic_waves][3:v]alphamerge[mic_masked];' + 
-        '[sys_waves][3:v]alphamerge[sys_masked];' + 
-        f'[0:v]scale={new_width}x{new_height}[scaled_screen];' + 
-        f'color=c=black:s={output_resolution[0]}x{output_resolution[1]}[bg];' + 
-        f'[bg][scaled_screen]overlay=(W-w)/2:{margin}[screen_on_bg];' + 
-        f'[screen_on_bg][mic_masked]overlay=shortest=1:x={margin}:y=main_h-overlay_h-{margin}[with_mic];' + 
-        f'[with_mic][sys_masked]overlay=shortest=1:x=W-w-{margin}:y=main_h-overlay_h-{margin},format=yuv420p[v];' + 
-        '[0:a]volume=2.0[a]',
-        '-map', '[v]', '-map', '[a]',
-        '-c:v', 'libx264', '-c:a', 'aac', '-b:a', '128k',
-        str(output_file)
-    ])
-    return output_file
+    layout = waves_layout(
+        mic="mic_waves", system="system_waves", mic_color=None, system_color=None, audio=("screen",)
+    )
+    sources = {"screen": screen_file, "mic_waves": mic_waves, "system_waves": system_waves}
+    return render_layout(layout, sources, output_file)
 
 def combine_screen_waves(output_file: Path, screen_file: Path, mic_waves: Path, system_waves: Path) -> Path:
-    margin = 30
-    wave_size = 100
-    #  output_file = folder_name / "all_waves.mp4"
-
-    # Use Path(__file__).parent to locate circle_mask.png relative to this script
-    circle_mask_path = Path(__file__).parent / "circle_mask.png" # Ensure this path is correct
-
-
-    # Calculate new height for the screen video
-    output_resolution = (1920, 1080)
-    new_height = output_resolution[1] - 3 * margin - wave_size
-    # Calculate new width while maintaining the aspect ratio
-    aspect_ratio = 16 / 9
-    new_width = int(new_height * aspect_ratio)
-
-    # NOTE: the system and mic waves have been switched so the filter names are opposite
-    subprocess.run([
-        'ffmpeg', '-y',
-        '-i', str(screen_file),
-        '-i', str(system_waves),
-        '-i', str(mic_waves),
-        '-i', str(circle_mask_path),
-        '-filter_complex',
-        f'[1:v]scale={wave_size}x{wave_size},format=yuva420p[mic_waves];' + 
-        f'[2:v]scale={wave_size}x{wave_size},format=yuva420p[sys_waves];' + 
-        '[mic_waves][3:v]alphamerge[mic_masked];' + 
-        '[sys_waves][3:v]alphamerge[sys_masked];' + 
-        f'[0:v]scale={new_width}x{new_height}[scaled_screen];' + 
-        f'color=c=black:s={output_resolution[0]}x{output_resolution[1]}[bg];' + 
-        f'[bg][scaled_screen]overlay=(W-w)/2:{margin}[screen_on_bg];' + 
-        f'[screen_on_bg][mic_masked]overlay=shortest=1:x={margin}:y=main_h-overlay_h-{margin}[with_mic];' + 
-        f'[with_mic][sys_masked]overlay=shortest=1:x=W-w-{margin}:y=main_h-overlay_h-{margin},format=yuv420p[v];' + 
-        '[1:a][2:a]amix=inputs=2:duration=shortest:normalize=0,volume=2.0[a]',
-        '-map', '[v]', '-map', '[a]',
-        '-c:v', 'libx264', '-c:a', 'aac', '-b:a', '128k',
-        str(output_file)
-    ])
-    return output_file
+    layout = waves_layout(
+        mic="mic_waves", system="system_waves", mic_color=None, system_color=None,
+        audio=("system_waves", "mic_waves"),
+    )
+    sources = {"screen": screen_file, "mic_waves": mic_waves, "system_waves": system_waves}
+    return render_layout(layout, sources, output_file)
@@ -0,0 +1,69 @@
+"""
+The "waves" composite in a single ffmpeg pass.
+
+The screen video is scaled onto a black canvas and the mic and system audio
+waveforms are drawn with ``showwaves`` straight from the audio inputs, masked
+to circles and overlaid in the bottom corners. Everything happens in one
+``filter_complex`` with one encode, instead of encoding each waveform to an
+intermediate mp4 and decoding it again for the overlay.
+"""
+from pathlib import Path
+
+from .layout import CIRCLE, Layout, Tile, compile_layout, render_layout
+
+
+def waves_layout(
+    margin=30,
+    wave_size=100,
+    mic_color="Blue",
+    system_color="Blue",
+    mic="mic",
+    system="system",
+    audio=("mic", "system"),
+) -> Layout:
+    """
+    The screen centred at the top with the system waves bottom left and the
+    mic waves bottom right, on a 1920x1080 canvas.
+
+    The waves are drawn from the ``mic`` and ``system`` audio; with a colour
+    of None that source is overlaid as already rendered video instead.
+    """
+    width, height = 1920, 1080
+    screen_height = height - 3 * margin - wave_size
+    screen_width = int(screen_height * 16 / 9)
+    wave_y = height - margin - wave_size
+    return Layout(
+        tiles=(
+            Tile("screen", (width - screen_width) // 2, margin, screen_width, screen_height),
+            Tile(system, margin, wave_y, wave_size, wave_size, CIRCLE, system_color),
+            Tile(mic, width - margin - wave_size, wave_y, wave_size, wave_size, CIRCLE, mic_color),
+        ),
+        width=width,
+        height=height,
+        audio=tuple(audio),
+    )
+
+
+def waves_filter_graph(resolution=None, **options) -> str:
+    """
+    The filter graph of :func:`waves_layout`, for inputs ``0`` screen video,
+    ``1`` system audio and ``2`` mic audio; the circle masks are drawn in
+    the graph.
+    """
+    return compile_layout(waves_layout(**options), resolution)
+
+
+def render_waves_composite(
+    output_file: Path,
+    screen_file: Path,
+    mic_audio: Path,
+    system_audio: Path,
+    resolution=None,
+    **options,
+) -> Path:
+    """
+    Render the screen with both waveform overlays and the mixed audio in one
+    ffmpeg run. ``options`` are passed on to :func:`waves_layout`.
+    """
+    sources = {"screen": screen_file, "mic": mic_audio, "system": system_audio}
+    return render_layout(waves_layout(**options), sources, output_file, resolution)
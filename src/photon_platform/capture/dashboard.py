@@ -0,0 +1,109 @@
+"""
+Textual dashboard for a running capture.
+
+Shows the :class:`telemetry.Telemetry` samples as they come in: audio peak
+and RMS meters with clip counts, screen fps against target, encoder queue
+depth and dropped buffers, plus any warnings. ``r`` starts an armed
+recording and ``q`` or Ctrl+C stops it.
+"""
+from rich.table import Table
+from rich.text import Text
+from textual.app import App, ComposeResult
+from textual.widgets import Footer, Header, Static
+
+from .telemetry import CLIP_DB, SILENT_DB
+
+METER_WIDTH = 40
+METER_FLOOR = -60.0
+
+
+def meter(db: float) -> Text:
+    """
+    A horizontal bar for a dBFS level, green to red near full scale.
+    """
+    fill = max(0.0, min(1.0, (max(db, METER_FLOOR) - METER_FLOOR) / -METER_FLOOR))
+    filled = int(round(fill * METER_WIDTH))
+    style = "red" if db >= CLIP_DB else "yellow" if db >= -6.0 else "green"
+    return Text("█" * filled, style=style) + Text("·" * (METER_WIDTH - filled), style="dim")
+
+
+class CaptureDashboard(App):
+    """
+    Live view of a recording; exits when the user stops it or ``done()``
+    turns true, e.g. when the capture ends on its own with EOS or an error.
+    """
+
+    TITLE = "capt"
+    BINDINGS = [
+        ("r", "record", "Start recording"),
+        ("q", "stop", "Stop recording"),
+        ("ctrl+c", "stop", "Stop recording"),
+    ]
+
+    def __init__(self, telemetry, title: str, done=lambda: False, preroll=None):
+        super().__init__()
+        self.telemetry = telemetry
+        self.done = done
+        self.preroll = preroll
+        self.title_text = title
+        self.sub_title = f"{title} (armed)" if preroll else title
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield Static(id="audio")
+        yield Static(id="video")
+        yield Static(id="warnings")
+        yield Footer()
+
+    def on_mount(self):
+        self.set_interval(self.telemetry.interval / 2, self.refresh_stats)
+
+    def refresh_stats(self):
+        if self.done():
+            self.exit()
+            return
+        sample = self.telemetry.samples[-1] if self.telemetry.samples else None
+        if sample is None:
+            return
+
+        audio = Table(title="Audio", expand=True)
+        for column in ("source", "peak", "", "rms", "clips"):
+            audio.add_column(column)
+        for name, stats in sample["audio"].items():
+            peak = stats["peak_db"]
+            audio.add_row(
+                name,
+                f"{peak:6.1f} dB" if peak > SILENT_DB else "  -inf",
+                meter(peak),
+                f"{stats['rms_db']:6.1f} dB",
+                Text(str(stats["clips"]), style="red" if stats["clips"] else ""),
+            )
+        self.query_one("#audio", Static).update(audio)
+
+        video = self.telemetry.video
+        target = video["target_fps"]
+        screen = Table(title="Screen", expand=True)
+        for column in ("elapsed", "fps", "target", "encoder queue", "dropped"):
+            screen.add_column(column)
+        screen.add_row(
+            f"{sample['elapsed']:.0f} s",
+            f"{sample['video']['fps']:.1f}",
+            f"{target:g}" if target else "?",
+            f"{sample['video']['queue_depth']}/{video['queue_max']}",
+            Text(str(video["dropped"]), style="red" if video["dropped"] else ""),
+        )
+        self.query_one("#video", Static).update(screen)
+
+        warnings = self.telemetry.warnings()
+        status = Text("\n".join(warnings), style="bold red") if warnings else Text("OK", style="green")
+        if self.preroll and self.preroll.armed:
+            status = Text(f"ARMED, press r to record. {self.preroll.report()}\n", style="bold yellow") + status
+        self.query_one("#warnings", Static).update(status)
+
+    def action_record(self):
+        if self.preroll and self.preroll.armed:
+            self.notify(self.preroll.release())
+            self.sub_title = self.title_text
+
+    def action_stop(self):
+        self.exit()
@@ -0,0 +1,134 @@
+"""
+Audio source discovery and hot-plug events.
+
+:class:`DeviceRegistry` lists the audio sources once through
+``Gst.DeviceMonitor``, with no ``pactl`` or other shell tool, and caches
+them. Exact pulse source names and fuzzy queries such as ``"Scarlett"`` both
+resolve to a :class:`AudioDevice`. While recording, the registry keeps
+watching, so an unplugged mic or monitor stops the capture loudly instead of
+leaving a silent track.
+"""
+from dataclasses import dataclass, field
+
+from . import gst
+
+SOURCE_CLASS = "Audio/Source"
+MONITOR_SUFFIX = ".monitor"
+
+
+@dataclass(frozen=True)
+class AudioDevice:
+    name: str  # what pulsesrc device= expects
+    description: str
+    product: str = ""
+    monitor: bool = False
+    device: object = field(default=None, compare=False, repr=False)
+
+    def matches(self, query: str) -> bool:
+        query = query.lower()
+        return any(query in text.lower() for text in (self.name, self.description, self.product))
+
+
+def _property(properties, key):
+    if properties is not None and properties.has_field(key):
+        return str(properties.get_value(key))
+    return ""
+
+
+def audio_device(device) -> AudioDevice:
+    """
+    An :class:`AudioDevice` from a ``Gst.Device`` found by the monitor.
+    """
+    properties = device.get_properties()
+    try:
+        # the pulse provider keeps the source name here
+        name = device.get_property("internal-name")
+    except TypeError:
+        name = _property(properties, "node.name") or device.get_display_name()
+    monitor = name.endswith(MONITOR_SUFFIX) or _property(properties, "device.class") == "monitor"
+    return AudioDevice(
+        name=name,
+        description=device.get_display_name(),
+        product=_property(properties, "device.product.name"),
+        monitor=monitor,
+        device=device,
+    )
+
+
+class DeviceRegistry:
+    """
+    Cached audio sources with fuzzy lookup and hot-plug notification.
+    """
+
+    def __init__(self):
+        self.monitor = gst.Gst.DeviceMonitor.new()
+        self.monitor.add_filter(SOURCE_CLASS, None)
+        self._devices = None
+        self._watch = None
+        self.in_use = {}
+
+    def devices(self, refresh=False) -> list:
+        """
+        Every audio source, enumerated on first use and cached.
+        """
+        if self._devices is None or refresh:
+            found = {}
+            for device in self.monitor.get_devices() or []:
+                entry = audio_device(device)
+                # several providers can report the same source
+                found.setdefault(entry.name, entry)
+            self._devices = list(found.values())
+        return self._devices
+
+    def resolve(self, query: str, monitor=None) -> AudioDevice:
+        """
+        The source named ``query``, or the one whose name, description or
+        product contains it. When several match, ``monitor`` prefers sink
+        monitors (True) or real inputs (False).
+
+        Raises ValueError, listing the sources, when nothing or more than one
+        source matches.
+        """
+        devices = self.devices()
+        for device in devices:
+            if device.name == query:
+                return device
+        candidates = [device for device in devices if device.matches(query)]
+        if len(candidates) > 1 and monitor is not None:
+            preferred = [device for device in candidates if device.monitor == monitor]
+            candidates = preferred or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        listing = "\n".join(f"  {d.name}  ({d.description})" for d in candidates or devices)
+        if candidates:
+            raise ValueError(f"'{query}' matches several audio sources:\n{listing}")
+        raise ValueError(f"no audio source matches '{query}'; available:\n{listing}")
+
+    def watch(self, on_removed):
+        """
+        Watch for hot-plug events on the GLib main loop. ``on_removed(role,
+        device)`` is called when a device registered in ``in_use`` (role to
+        device) disappears; additions and removals also refresh the cache.
+        """
+        bus = self.monitor.get_bus()
+        self._watch = bus.add_watch(gst.GLib.PRIORITY_DEFAULT, self._on_message, on_removed)
+        self.monitor.start()
+
+    def _on_message(self, bus, message, on_removed):
+        if message.type == gst.Gst.MessageType.DEVICE_REMOVED:
+            removed = audio_device(message.parse_device_removed())
+            self._devices = [d for d in self._devices or [] if d.name != removed.name]
+            for role, device in self.in_use.items():
+                if device.name == removed.name:
+                    on_removed(role, device)
+        elif message.type == gst.Gst.MessageType.DEVICE_ADDED:
+            added = audio_device(message.parse_device_added())
+            if self._devices is not None and added.name not in {d.name for d in self._devices}:
+                self._devices.append(added)
+        return True
+
+    def stop(self):
+        if self._watch is not None:
+            gst.GLib.source_remove(self._watch)
+            self._watch = None
+            self.monitor.stop()
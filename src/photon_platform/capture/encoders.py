@@ -0,0 +1,136 @@
+"""
+Screen encoder presets and a benchmark to choose between them.
+
+A preset is the GStreamer launch fragment between ``videoconvert`` and the
+muxer in the screen branch, picked by name with ``capt --encoder``.
+"""
+from dataclasses import dataclass
+import os
+import time
+
+from . import gst
+
+THREADS = os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class EncoderPreset:
+    name: str
+    description: str
+    encoder: str
+
+
+ENCODER_PRESETS = {
+    preset.name: preset
+    for preset in (
+        EncoderPreset(
+            "vp8",
+            "VP8, good-quality deadline (the original settings)",
+            "vp8enc cpu-used=4 target-bitrate=2000000",
+        ),
+        EncoderPreset(
+            "vp8-realtime",
+            "VP8 realtime deadline, CBR, threaded",
+            f"vp8enc deadline=1 cpu-used=8 threads={THREADS} token-partitions=2 "
+            f"end-usage=cbr target-bitrate=2000000 lag-in-frames=0",
+        ),
+        EncoderPreset(
+            "x264",
+            "H.264 zerolatency/ultrafast",
+            "x264enc tune=zerolatency speed-preset=ultrafast bitrate=4000 key-int-max=50",
+        ),
+        EncoderPreset(
+            "lossless",
+            "H.264 lossless intermediate, large files, least CPU per frame",
+            "x264enc speed-preset=ultrafast pass=quant quantizer=0 key-int-max=50",
+        ),
+    )
+}
+DEFAULT_ENCODER = "vp8"
+
+
+def get_encoder(name: str) -> EncoderPreset:
+    """
+    Look up a preset by name, listing the valid names when it is unknown.
+    """
+    try:
+        return ENCODER_PRESETS[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown encoder preset '{name}', choose from {', '.join(ENCODER_PRESETS)}"
+        ) from None
+
+
+def benchmark_encoder(preset: EncoderPreset, seconds=10.0, width=1920, height=1080, fps=25) -> dict:
+    """
+    Encode a live ``videotestsrc`` with ``preset`` for ``seconds``.
+
+    A leaky queue in front of the encoder drops frames the encoder cannot
+    keep up with, the way a live capture would. Returns the achieved fps,
+    the process CPU use in percent of one core and the dropped buffer count.
+    """
+    pipeline = gst.Gst.parse_launch(
+        f"videotestsrc is-live=true pattern=smpte horizontal-speed=4 name=src ! "
+        f"video/x-raw,width={width},height={height},framerate={fps}/1 ! "
+        f"queue leaky=downstream max-size-buffers={fps} max-size-time=0 max-size-bytes=0 ! "
+        f"videoconvert ! {preset.encoder} ! fakesink name=sink sync=false"
+    )
+    counts = {"produced": 0, "encoded": 0}
+
+    def count(key):
+        def probe(pad, info):
+            counts[key] += 1
+            return gst.Gst.PadProbeReturn.OK
+        return probe
+
+    pipeline.get_by_name("src").get_static_pad("src").add_probe(
+        gst.Gst.PadProbeType.BUFFER, count("produced")
+    )
+    pipeline.get_by_name("sink").get_static_pad("sink").add_probe(
+        gst.Gst.PadProbeType.BUFFER, count("encoded")
+    )
+
+    bus = pipeline.get_bus()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    pipeline.set_state(gst.Gst.State.PLAYING)
+
+    message = bus.timed_pop_filtered(int(seconds * gst.Gst.SECOND), gst.Gst.MessageType.ERROR)
+    if message is None:
+        pipeline.send_event(gst.Gst.Event.new_eos())
+        message = bus.timed_pop_filtered(
+            30 * gst.Gst.SECOND, gst.Gst.MessageType.EOS | gst.Gst.MessageType.ERROR
+        )
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    pipeline.set_state(gst.Gst.State.NULL)
+
+    if message is not None and message.type == gst.Gst.MessageType.ERROR:
+        err, _ = message.parse_error()
+        raise RuntimeError(f"{preset.name}: {err.message}")
+
+    return {
+        "name": preset.name,
+        "fps": counts["encoded"] / wall,
+        "cpu": 100 * cpu / wall,
+        "dropped": counts["produced"] - counts["encoded"],
+        "frames": counts["encoded"],
+    }
+
+
+def benchmark_encoders(names=None, seconds=10.0):
+    """
+    Run :func:`benchmark_encoder` for each preset and print a table.
+    """
+    names = names or list(ENCODER_PRESETS)
+    print(f"{'preset':<14} {'fps':>7} {'cpu %':>7} {'dropped':>8}")
+    results = []
+    for name in names:
+        try:
+            result = benchmark_encoder(get_encoder(name), seconds)
+        except RuntimeError as e:
+            print(f"{name:<14} failed: {e}")
+            continue
+        print(f"{name:<14} {result['fps']:7.1f} {result['cpu']:7.0f} {result['dropped']:8d}")
+        results.append(result)
+    return results
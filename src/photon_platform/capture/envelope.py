@@ -0,0 +1,153 @@
+"""
+Loudness envelope of an audio file and its on-disk sidecar.
+
+The envelope is the RMS level in dBFS of consecutive 10 ms frames. It is
+stored next to the audio as ``<name>.env`` (raw float16, memory-mapped on
+load) with a ``<name>.env.json`` describing the source it was built from.
+Silence cutting and level checks read the sidecar instead of decoding the
+audio again; it is rebuilt when the source's size, mtime and hash no longer
+match.
+"""
+import json
+import os
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+from .probe import media_hash
+from .segments import ffmpeg_input
+
+DEFAULT_RATE = 16000
+DEFAULT_FRAME = 0.01  # seconds per envelope frame
+SILENT_DB = -120.0
+SIDECAR_DTYPE = "float16"
+
+
+def decode_pcm(file_path: Path, rate=DEFAULT_RATE) -> np.ndarray:
+    """
+    Decode any ffmpeg-readable file to mono float32 samples at ``rate``.
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-nostdin",
+            *ffmpeg_input(file_path),
+            "-vn", "-ac", "1", "-ar", str(rate),
+            "-f", "f32le", "pipe:1",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def rms_envelope(samples: np.ndarray, rate=DEFAULT_RATE, frame=DEFAULT_FRAME) -> np.ndarray:
+    """
+    RMS level in dBFS of consecutive ``frame``-second windows.
+
+    A trailing partial window is padded with silence.
+    """
+    size = max(1, int(round(rate * frame)))
+    full = len(samples) // size
+    frames = samples[: full * size].reshape(full, size)
+    power = np.einsum("ij,ij->i", frames, frames) / size
+    tail = samples[full * size:]
+    if len(tail):
+        power = np.append(power, np.dot(tail, tail) / size)
+    with np.errstate(divide="ignore"):
+        db = 10.0 * np.log10(power)
+    return np.maximum(db, SILENT_DB).astype(np.float32)
+
+
+def sidecar_paths(audio_file: Path):
+    """
+    The envelope data and metadata paths for ``audio_file``.
+    """
+    audio_file = Path(audio_file)
+    data = audio_file.with_name(audio_file.name + ".env")
+    return data, data.with_name(data.name + ".json")
+
+
+def _read_meta(meta_file: Path):
+    try:
+        return json.loads(meta_file.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def build_envelope(audio_file: Path, frame=DEFAULT_FRAME) -> Path:
+    """
+    Decode ``audio_file`` once and write its envelope sidecar.
+    """
+    audio_file = Path(audio_file)
+    data_file, meta_file = sidecar_paths(audio_file)
+    stat = audio_file.stat()
+    envelope = rms_envelope(decode_pcm(audio_file), DEFAULT_RATE, frame)
+
+    # write-then-rename so a reader never maps a half-written sidecar
+    tmp = data_file.with_name(data_file.name + ".tmp")
+    envelope.astype(SIDECAR_DTYPE).tofile(tmp)
+    os.replace(tmp, data_file)
+    meta = {
+        "source": audio_file.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "md5": media_hash(audio_file),
+        "frame": frame,
+        "frames": len(envelope),
+        "dtype": SIDECAR_DTYPE,
+    }
+    meta_file.write_text(json.dumps(meta, indent=2))
+    return data_file
+
+
+def is_fresh(audio_file: Path, frame=DEFAULT_FRAME) -> bool:
+    """
+    Whether the sidecar of ``audio_file`` matches the file as it is now.
+
+    Size and mtime are checked first; only when they differ is the file
+    hashed, so a touched but unchanged file keeps its sidecar.
+    """
+    audio_file = Path(audio_file)
+    data_file, meta_file = sidecar_paths(audio_file)
+    meta = _read_meta(meta_file)
+    if not meta or not data_file.exists() or meta.get("frame") != frame:
+        return False
+    stat = audio_file.stat()
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if meta["size"] == stat.st_size and meta["md5"] == media_hash(audio_file):
+        meta["mtime_ns"] = stat.st_mtime_ns
+        meta_file.write_text(json.dumps(meta, indent=2))
+        return True
+    return False
+
+
+def load_envelope(audio_file: Path, frame=DEFAULT_FRAME) -> np.ndarray:
+    """
+    Memory-mapped envelope of ``audio_file``, rebuilding a stale sidecar.
+    """
+    if not is_fresh(audio_file, frame):
+        build_envelope(audio_file, frame)
+    data_file, meta_file = sidecar_paths(audio_file)
+    if _read_meta(meta_file)["frames"] == 0:
+        # shorter than a frame or undecodable; an empty file cannot be mapped
+        return np.zeros(0, SIDECAR_DTYPE)
+    return np.memmap(data_file, dtype=SIDECAR_DTYPE, mode="r")
+
+
+def envelope_stats(envelope: np.ndarray, frame=DEFAULT_FRAME, floor=-30.0) -> dict:
+    """
+    Quick level check: peak and mean level in dBFS and the share of time
+    above ``floor``.
+    """
+    levels = np.asarray(envelope, dtype=np.float32)
+    if not len(levels):
+        return {"duration": 0.0, "peak_db": SILENT_DB, "mean_db": SILENT_DB, "active": 0.0}
+    power = np.power(10.0, levels / 10.0)
+    return {
+        "duration": len(levels) * frame,
+        "peak_db": float(levels.max()),
+        "mean_db": float(10.0 * np.log10(max(power.mean(), 1e-12))),
+        "active": float((levels >= floor).mean()),
+    }
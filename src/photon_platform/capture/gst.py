@@ -0,0 +1,32 @@
+"""
+GStreamer, loaded on first use.
+
+Importing ``gi`` and initializing GStreamer scans the plugin registry, which
+costs far more than the rest of the package's startup. Modules import this
+module instead and refer to ``gst.Gst``, ``gst.GLib`` and ``gst.GstVideo``;
+the first such access loads and initializes GStreamer once, so ``capt
+--help`` and the ffmpeg-only stages never pay for it.
+"""
+import functools
+
+MODULES = ("Gst", "GLib", "GstVideo")
+
+
+@functools.lru_cache(maxsize=None)
+def load() -> dict:
+    """
+    Import the GI modules and run ``Gst.init``, once per process.
+    """
+    import gi
+    gi.require_version("Gst", "1.0")
+    gi.require_version("GstVideo", "1.0")
+    from gi.repository import Gst, GLib, GstVideo
+
+    Gst.init(None)
+    return {"Gst": Gst, "GLib": GLib, "GstVideo": GstVideo}
+
+
+def __getattr__(name):
+    if name in MODULES:
+        return load()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,18 @@
+"""
+Content hashing for media files.
+"""
+import hashlib
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_md5(file_path: Path, chunk_size=CHUNK_SIZE) -> str:
+    """
+    MD5 hex digest of ``file_path``, read in chunks to keep memory flat.
+    """
+    digest = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,129 @@
+"""
+A small job graph for the post-capture stages.
+
+Each stage is a :class:`Job` naming the jobs it has to wait for. Independent
+jobs run concurrently on a bounded thread pool; the heavy lifting happens in
+ffmpeg subprocesses, so threads are enough to keep the cores busy.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import os
+import time
+from typing import Any, Callable
+
+FAIL_FAST = "fail-fast"
+CONTINUE = "continue"
+POLICIES = (FAIL_FAST, CONTINUE)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@dataclass
+class Job:
+    """
+    A unit of post-capture work and its outcome.
+    """
+
+    name: str
+    func: Callable
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    after: tuple = ()
+    status: str = "pending"
+    result: Any = None
+    error: BaseException = None
+    elapsed: float = 0.0
+
+
+def _check_graph(jobs):
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate job names in {names}")
+    for job in jobs:
+        for dep in job.after:
+            if dep not in names:
+                raise ValueError(f"job '{job.name}' waits for unknown job '{dep}'")
+
+    # Kahn's algorithm: anything left unsorted is part of a cycle
+    remaining = {job.name: set(job.after) for job in jobs}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"job graph has a cycle among {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def _timed(job):
+    start = time.perf_counter()
+    try:
+        return job.func(*job.args, **job.kwargs)
+    finally:
+        job.elapsed = time.perf_counter() - start
+
+
+def run_jobs(jobs, max_workers=DEFAULT_WORKERS, policy=FAIL_FAST):
+    """
+    Run ``jobs`` respecting their ``after`` dependencies.
+
+    With the ``fail-fast`` policy no new job starts once one has failed;
+    running jobs finish and everything else is marked ``skipped``. With
+    ``continue`` only the jobs depending on a failure are skipped.
+
+    Returns the jobs with ``status``, ``result``, ``error`` and ``elapsed``
+    filled in. Failures are reported there rather than raised.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"unknown failure policy '{policy}', expected one of {POLICIES}")
+    jobs = list(jobs)
+    _check_graph(jobs)
+    by_name = {job.name: job for job in jobs}
+
+    running = {}
+    stop = False
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            changed = True
+            while changed:
+                changed = False
+                for job in jobs:
+                    if job.status != "pending":
+                        continue
+                    deps = [by_name[dep] for dep in job.after]
+                    if stop or any(dep.status in ("failed", "skipped") for dep in deps):
+                        job.status = "skipped"
+                        changed = True
+                    elif all(dep.status == "done" for dep in deps):
+                        job.status = "running"
+                        print(f"[{job.name}] started")
+                        running[pool.submit(_timed, job)] = job
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = running.pop(future)
+                try:
+                    job.result = future.result()
+                    job.status = "done"
+                    print(f"[{job.name}] done in {job.elapsed:.1f}s")
+                except Exception as e:
+                    job.error = e
+                    job.status = "failed"
+                    print(f"[{job.name}] FAILED after {job.elapsed:.1f}s: {e}")
+                    if policy == FAIL_FAST:
+                        stop = True
+
+    return jobs
+
+
+def print_job_summary(jobs):
+    """
+    Print one line per job with its status and wall-clock time.
+    """
+    print("Post-processing summary:")
+    for job in jobs:
+        print(f"  {job.name:<12} {job.status:<8} {job.elapsed:7.1f}s")
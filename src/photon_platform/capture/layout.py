@@ -0,0 +1,194 @@
+"""
+Declarative overlay layouts compiled to ffmpeg filter graphs.
+
+A :class:`Layout` is a canvas size, a background and a list of
+:class:`Tile` placements, all in pixels of that canvas. Each tile shows a
+named source, either its video or, with ``waves`` set, its audio drawn by
+``showwaves``, optionally cut to the shape of a mask image or of a circle
+drawn in the graph (:data:`CIRCLE`).
+:func:`compile_layout` turns it into one ``filter_complex`` at any output
+resolution, so a 720p preview and a 4K master come from the same layout.
+
+The compiler keeps the graph small: every input is decoded once and split
+only when several tiles use it, waveforms are drawn at their tile size
+instead of being scaled afterwards, scale and pixel format conversions share
+one chain, and each mask is scaled once per tile size and shared.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+from .cache import run_cached
+from .segments import ffmpeg_input, source_files
+
+# a mask drawn in the graph: the circle inscribed in the tile
+CIRCLE = "circle"
+
+
+@dataclass(frozen=True)
+class Tile:
+    source: str
+    x: int
+    y: int
+    width: int
+    height: int
+    mask: Path = None  # an image, or CIRCLE
+    waves: str = None  # showwaves colour; draws the source's audio
+
+
+@dataclass(frozen=True)
+class Layout:
+    tiles: tuple
+    width: int = 1920
+    height: int = 1080
+    background: str = "black"
+    audio: tuple = ()  # sources mixed into the soundtrack
+    gain: float = 2.0
+
+
+def _even(value: float) -> int:
+    # x264 and yuv420p need even dimensions
+    return max(2, 2 * round(value / 2))
+
+
+def layout_inputs(layout: Layout) -> list:
+    """
+    The ffmpeg inputs of a layout, in ``-i`` order: source names first,
+    then mask paths. :data:`CIRCLE` masks are drawn, not read.
+    """
+    inputs = []
+    for name in [tile.source for tile in layout.tiles] + list(layout.audio):
+        if name not in inputs:
+            inputs.append(name)
+    for tile in layout.tiles:
+        if tile.mask not in (None, CIRCLE) and Path(tile.mask) not in inputs:
+            inputs.append(Path(tile.mask))
+    return inputs
+
+
+def compile_layout(layout: Layout, resolution=None) -> str:
+    """
+    The filter graph for ``layout`` rendered at ``resolution`` (default the
+    layout's own size). Inputs are numbered as in :func:`layout_inputs`;
+    the outputs are ``[v]`` and, when the layout has audio, ``[a]``.
+
+    Raises ValueError for a layout with neither tiles nor audio, whose
+    background alone would never end.
+    """
+    if not layout.tiles and not layout.audio:
+        raise ValueError("a layout needs tiles or audio")
+    width, height = resolution or (layout.width, layout.height)
+    sx, sy = width / layout.width, height / layout.height
+    inputs = layout_inputs(layout)
+    index = {name: i for i, name in enumerate(inputs)}
+    chains = []
+
+    def placed(tile):
+        return (
+            round(tile.x * sx), round(tile.y * sy),
+            _even(tile.width * sx), _even(tile.height * sy),
+        )
+
+    # split every stream used more than once
+    uses = {}
+    for n, tile in enumerate(layout.tiles):
+        kind = "a" if tile.waves else "v"
+        uses.setdefault((tile.source, kind), []).append(f"t{n}")
+    for name in layout.audio:
+        uses.setdefault((name, "a"), []).append(f"mix_{index[name]}")
+    streams = {}
+    for (name, kind), labels in uses.items():
+        stream = f"{index[name]}:{kind}"
+        if len(labels) == 1:
+            streams[labels[0]] = stream
+            continue
+        split = "asplit" if kind == "a" else "split"
+        outs = "".join(f"[{label}_in]" for label in labels)
+        chains.append(f"[{stream}]{split}={len(labels)}{outs}")
+        for label in labels:
+            streams[label] = f"{label}_in"
+
+    # one scaled copy of each mask per tile size
+    masks = {}
+    for n, tile in enumerate(layout.tiles):
+        if tile.mask is not None:
+            mask = CIRCLE if tile.mask == CIRCLE else Path(tile.mask)
+            masks.setdefault((mask, placed(tile)[2:]), []).append(f"t{n}")
+    mask_labels = {}
+    for m, ((mask, (w, h)), labels) in enumerate(masks.items()):
+        if mask == CIRCLE:
+            # white inside the circle through the pixel centres, black outside
+            chain = (
+                f"color=c=white:s={w}x{h},format=gray,"
+                f"geq=lum='255*lte(hypot(2*X+1-W,2*Y+1-H),min(W,H))'"
+            )
+        else:
+            chain = f"[{index[mask]}:v]scale={w}:{h},format=gray"
+        if len(labels) == 1:
+            chains.append(f"{chain}[mask{m}]")
+            mask_labels[labels[0]] = f"mask{m}"
+        else:
+            outs = "".join(f"[mask{m}_{k}]" for k in range(len(labels)))
+            chains.append(f"{chain},split={len(labels)}{outs}")
+            mask_labels.update({label: f"mask{m}_{k}" for k, label in enumerate(labels)})
+
+    # tiles, each as a single chain ending at its final size and format
+    for n, tile in enumerate(layout.tiles):
+        label = f"t{n}"
+        _, _, w, h = placed(tile)
+        if tile.waves:
+            # same look as generate_waveform: draw twice as tall, keep the middle
+            filters = [f"showwaves=s={w}x{2 * h}:mode=cline:colors={tile.waves}", f"crop={w}:{h}"]
+        else:
+            filters = [f"scale={w}:{h}"]
+        if label in mask_labels:
+            filters.append("format=yuva420p")
+            chains.append(f"[{streams[label]}]{','.join(filters)}[{label}_raw]")
+            chains.append(f"[{label}_raw][{mask_labels[label]}]alphamerge[{label}]")
+        else:
+            chains.append(f"[{streams[label]}]{','.join(filters)}[{label}]")
+
+    chains.append(f"color=c={layout.background}:s={width}x{height}[bg]")
+    below = "bg"
+    for n, tile in enumerate(layout.tiles):
+        x, y, _, _ = placed(tile)
+        last = n == len(layout.tiles) - 1
+        out = "[v]" if last else f"[bg{n}]"
+        tail = ",format=yuv420p" if last else ""
+        chains.append(f"[{below}][t{n}]overlay=shortest=1:x={x}:y={y}{tail}{out}")
+        below = f"bg{n}"
+    if not layout.tiles:
+        chains.append("[bg]format=yuv420p[v]")
+
+    if layout.audio:
+        mix = "".join(f"[{streams[f'mix_{index[name]}']}]" for name in layout.audio)
+        if len(layout.audio) > 1:
+            mix += f"amix=inputs={len(layout.audio)}:duration=shortest:normalize=0,"
+        chains.append(f"{mix}volume={layout.gain}[a]")
+
+    return ";".join(chains)
+
+
+def render_layout(
+    layout: Layout, sources: dict, output_file: Path, resolution=None
+) -> Path:
+    """
+    Render ``layout`` with ``sources`` (source name to file) in one ffmpeg
+    run and a single x264/aac encode. Segmented sources are read through
+    their manifests.
+    """
+    files = [sources[name] if isinstance(name, str) else name for name in layout_inputs(layout)]
+    command = ['ffmpeg', '-y']
+    for file in files:
+        command += ffmpeg_input(file)
+    command += [
+        '-filter_complex', compile_layout(layout, resolution),
+        '-map', '[v]',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+    ]
+    if layout.audio:
+        # without tiles the background is endless; the audio sets the length
+        command += ['-map', '[a]', '-c:a', 'aac', '-b:a', '128k', '-shortest']
+    command.append(str(output_file))
+    inputs = [*files, *(path for file in files for path in source_files(file))]
+    run_cached(command, inputs, output_file)
+    return output_file
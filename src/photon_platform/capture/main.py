@@ -1,30 +1,72 @@
 import argparse
 import datetime
 from pathlib import Path
+import sys
 import threading
-import gi
-gi.require_version("Gst", "1.0")
-from gi.repository import Gst, GLib
-import time
+from . import gst
 
 # Use relative imports within the package
 from .capture import (
-    configure_mic_pipeline,
-    configure_screen_pipeline,
-    configure_system_audio_pipeline,
-    display_elapsed_time,
+    DEFAULT_MIC,
+    DEFAULT_SYSTEM_AUDIO,
+    configure_session_pipeline,
+    clean_audio_path,
     clean_mic_audio,
+    MUX_MODES,
+    LIVE_CLEAN_ELEMENTS,
+    start_live_clean,
+    isolate_live_clean,
+    finish_live_clean,
     combine_video_system_audio,
+    make_proxy,
     slugify,
 )
+from .devices import DeviceRegistry
+from .envelope import build_envelope
+from .encoders import DEFAULT_ENCODER, ENCODER_PRESETS, benchmark_encoders
+from .jobs import DEFAULT_WORKERS, FAIL_FAST, POLICIES, Job, print_job_summary, run_jobs
 from .mlt_generator import generate_mlt_file, launch_shotcut
+from . import cache, reprocess
+from .roughcut import rough_cut
+from .screen import DEFAULT_FPS, DEFAULT_SCREEN, ScreenOptions, monitor_region, parse_region
+from .segments import SEGMENT_DIR, SegmentManifests, manifest_path
+from .shutdown import DEFAULT_EOS_TIMEOUT, ShutdownCoordinator
+from .preroll import DEFAULT_PREROLL, Preroll
+from .telemetry import METRICS_NAME, Telemetry, print_status
 
 #  DEFAULT_SESSIONS_DIR = Path.home() / 'Sessions'
 DEFAULT_SESSIONS_DIR = Path('.')
 
-def run(output_dir: Path, title: str):
+def run(
+    output_dir: Path,
+    title: str,
+    test_sources: bool = False,
+    eos_timeout: float = DEFAULT_EOS_TIMEOUT,
+    live_clean: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    on_failure: str = FAIL_FAST,
+    mux_mode: str = "auto",
+    encoder: str = DEFAULT_ENCODER,
+    proxy: bool = True,
+    segment_time: float = 0,
+    segment_bytes: int = 0,
+    dashboard: bool = False,
+    preroll: float = 0,
+    screen: ScreenOptions = DEFAULT_SCREEN,
+    mic_device: str = DEFAULT_MIC,
+    system_device: str = DEFAULT_SYSTEM_AUDIO,
+    devices: DeviceRegistry = None,
+    post_process: bool = True,
+):
     """
     Main function to run the recording process.
+
+    With a ``devices`` registry, unplugging any device in its ``in_use``
+    stops the recording as an error.
+
+    Returns the session folder. Without ``post_process`` it returns right
+    after the recording, leaving the stages to a workflow or the stage
+    commands.
     """
     slug = slugify(title)
     ts = datetime.datetime.now().strftime("%y.%j.%H%M%S")
@@ -35,85 +77,435 @@ def run(output_dir: Path, title: str):
     mic_file = folder_path / "mic.ogg"
     screen_file = folder_path / "screen.mkv"
     system_file = folder_path / "system.ogg"
+    proxy_file = folder_path / "proxy.mkv" if proxy else None
+    mic_clean_file = clean_audio_path(mic_file)
+    segmented = bool(segment_time or segment_bytes)
+    if segmented:
+        (folder_path / SEGMENT_DIR).mkdir(exist_ok=True)
 
-    Gst.init(None) # Initialize GStreamer
-    mic_pipeline = configure_mic_pipeline(mic_file)
-    screen_pipeline = configure_screen_pipeline(screen_file)
-    system_audio_pipeline = configure_system_audio_pipeline(system_file)
-
-    loop = GLib.MainLoop()
-    stop_event = threading.Event()
+    # clean the mic while recording so mic_clean.ogg is ready right after stop
+    cleaner = start_live_clean(mic_clean_file) if live_clean else None
 
-    start_time = time.time()
-    elapsed_thread = threading.Thread(
-        target=display_elapsed_time, args=(start_time, stop_event)
+    # one pipeline, one clock: the three files share a common timeline
+    pipeline = configure_session_pipeline(
+        mic_file, screen_file, system_file,
+        mic_device=mic_device,
+        system_device=system_device,
+        test_sources=test_sources,
+        mic_clean_fd=cleaner[1] if cleaner else None,
+        encoder=encoder,
+        proxy_file=proxy_file,
+        segment_time=segment_time,
+        segment_bytes=segment_bytes,
+        preroll=preroll,
+        screen=screen,
     )
-    elapsed_thread.start()
+
+    loop = gst.GLib.MainLoop()
+    # a failing live cleaner only costs the live clean, never the recording
+    coordinator = ShutdownCoordinator([pipeline], loop, optional=LIVE_CLEAN_ELEMENTS if cleaner else ())
+    coordinator.watch()
+    live_clean_state = isolate_live_clean(pipeline) if cleaner else None
+    if devices is not None:
+        devices.watch(
+            lambda role, device: coordinator.abort(role, f"{device.description} was disconnected")
+        )
+    if segmented:
+        manifests = SegmentManifests([mic_file, screen_file, system_file])
+        manifests.watch(pipeline)
+    telemetry = Telemetry(pipeline, folder_path / METRICS_NAME)
+    telemetry.watch()
 
     print(f"Starting recording for '{title}'...")
     print(f"Output folder: {folder_path}")
+    armed = None
+    if preroll:
+        # sources run into ring buffers until the recording is started
+        armed = Preroll(pipeline)
+        armed.arm()
+        print(
+            f"Armed with {preroll:g}s of pre-roll "
+            f"(at most {armed.limit_bytes() / 1024**2:.0f} MB). "
+            + ("Press r to start recording." if dashboard else "Press Enter to start recording.")
+        )
     print("Press Ctrl+C to stop recording.")
 
-    try:
-        # Start the pipelines
-        mic_pipeline.set_state(Gst.State.PLAYING)
-        screen_pipeline.set_state(Gst.State.PLAYING)
-        system_audio_pipeline.set_state(Gst.State.PLAYING)
-        loop.run()
-    except KeyboardInterrupt:
-        print("\nStopping recording...")
-        # Send EOS to each pipeline
-        mic_pipeline.send_event(Gst.Event.new_eos())
-        screen_pipeline.send_event(Gst.Event.new_eos())
-        system_audio_pipeline.send_event(Gst.Event.new_eos())
-
-        # Allow some time for EOS to propagate and files to finalize
-        time.sleep(1) # Adjust sleep time if needed
-
-        # Stop the pipelines
-        mic_pipeline.set_state(Gst.State.NULL)
-        screen_pipeline.set_state(Gst.State.NULL)
-        system_audio_pipeline.set_state(Gst.State.NULL)
-        loop.quit()
+    if dashboard:
+        from .dashboard import CaptureDashboard
 
+        # Textual needs the main thread, so the GLib loop runs beside it
+        pipeline.set_state(gst.Gst.State.PLAYING)
+        loop_thread = threading.Thread(target=loop.run)
+        loop_thread.start()
+        CaptureDashboard(
+            telemetry, title,
+            done=lambda: coordinator.errors or coordinator.finished,
+            preroll=armed,
+        ).run()
+        loop.quit()
+        loop_thread.join()
+    else:
+        stop_event = threading.Event()
+        status_thread = threading.Thread(target=print_status, args=(telemetry, stop_event))
+        status_thread.start()
+        if armed:
+            def start_recording(fd, condition):
+                sys.stdin.readline()
+                print(f"\n{armed.release()}\nRecording.")
+                return False
+            gst.GLib.io_add_watch(sys.stdin.fileno(), gst.GLib.PRIORITY_DEFAULT, gst.GLib.IO_IN, start_recording)
+        try:
+            # Start the pipeline
+            pipeline.set_state(gst.Gst.State.PLAYING)
+            loop.run()
+        except KeyboardInterrupt:
+            print("\nStopping recording...")
         stop_event.set()
-        elapsed_thread.join()
-        print("Recording stopped.")
+        status_thread.join()
 
-    print("Processing audio...")
-    mic_clean_file = clean_mic_audio(mic_file)
-    print(f"Cleaned mic audio saved as: {mic_clean_file}")
+    if armed and armed.armed:
+        # stopped before starting: keep the pre-roll, and let EOS through
+        print(armed.release())
+    # Wait for EOS on the bus so the muxers can write their index
+    coordinator.stop(timeout=eos_timeout)
+    if devices is not None:
+        devices.stop()
+    print("Recording stopped.")
+    telemetry.finish()
+    for warning in telemetry.warnings():
+        print(f"WARNING: {warning}")
+    if coordinator.errors:
+        print("Recording ended with errors; post-processing what was written.")
+    if segmented:
+        # from here on each stream is read through its concat manifest
+        manifests.finalize()
+        mic_file, screen_file, system_file = (
+            manifest_path(path) for path in (mic_file, screen_file, system_file)
+        )
 
-    print("Combining screen video and system audio...")
     system_video_audio_file = folder_path / "system_video_audio.mkv"
-    combine_video_system_audio(screen_file, system_file, system_video_audio_file)
-    print(f"Combined video/system audio saved as: {system_video_audio_file}")
+    mlt_file = folder_path / f"{slug}.mlt"
+
+    live_cleaned = (
+        cleaner is not None
+        and finish_live_clean(*cleaner) == 0
+        and not live_clean_state["lost"]
+    )
+    if live_cleaned:
+        print("Mic audio was cleaned live.")
+        # so reprocess and the stage commands do not clean it again
+        reprocess.mark_done(folder_path, "clean")
+    elif cleaner is not None:
+        print("Live mic cleaning is incomplete; cleaning the mic again.")
+    if not post_process:
+        return folder_path
 
-    print("Generating MLT file...")
-    mlt_file = generate_mlt_file(mic_clean_file, folder_path / f"{slug}.mlt")
-    print(f"MLT file generated: {mlt_file}")
+    # mic cleaning and the video mux are independent; the MLT needs the clean mic
+    jobs = []
+    if live_cleaned:
+        mlt_after = ()
+    else:
+        jobs.append(Job("clean", clean_mic_audio, (mic_file,)))
+        mlt_after = ("clean",)
+    jobs.append(Job(
+        "mux", combine_video_system_audio,
+        (screen_file, system_file, system_video_audio_file),
+        {"mode": mux_mode},
+    ))
+    if proxy:
+        # the proxy is named by the hash of the muxed file it stands in for
+        jobs.append(Job(
+            "proxy", make_proxy,
+            (proxy_file, system_file, system_video_audio_file),
+            after=("mux",),
+        ))
+    jobs.append(Job(
+        "mlt", generate_mlt_file, (mic_clean_file, mlt_file),
+        after=mlt_after + (("proxy",) if proxy else ()),
+    ))
+    # loudness sidecar for silence cutting and level checks
+    jobs.append(Job("envelope", build_envelope, (mic_clean_file,), after=mlt_after))
+    jobs.append(Job(
+        "roughcut", rough_cut,
+        (folder_path, folder_path / f"{slug}_roughcut.mlt"),
+        after=("envelope",),
+    ))
+
+    print("Post-processing...")
+    jobs = run_jobs(jobs, max_workers=workers, policy=on_failure)
+    print_job_summary(jobs)
+    if any(job.status != "done" for job in jobs):
+        print("Post-processing did not complete; not launching Shotcut.")
+        return folder_path
 
     # Launch Shotcut with the generated MLT file
     print("Launching Shotcut...")
     launch_shotcut(mlt_file.resolve())
     print("Process complete.")
+    return folder_path
+
+
+COMMANDS = {
+    "record": "record a session and post-process it (the default)",
+    "clean": "clean the mic audio of session folders",
+    "mux": "attach the system audio to the screen video",
+    "transcribe": "transcribe the clean mic into subtitles",
+    "rough-cut": "cut the silences out into a rough-cut project",
+    "waves": "render the screen with waveform overlays",
+    "render": "render a session's project with melt",
+    "reprocess": "re-run stale stages across archived sessions",
+    "workflow": "record and post-process as a named YAML workflow",
+}
 
 
-def main():
+def record_parser(prog="capt") -> argparse.ArgumentParser:
     """
-    Entry point function with argument parsing for the 'capture' script.
+    The options of ``capt record``, also the top-level ``capt --help``.
     """
-    parser = argparse.ArgumentParser(description="Record screen, microphone, and system audio.")
-    parser.add_argument("title", help="Title for the recording session.")
+    commands = "\n".join(f"  {name:<11} {help}" for name, help in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Record screen, microphone, and system audio.",
+        epilog=f"commands:\n{commands}\n\nRun 'capt COMMAND --help' for the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("title", nargs="?", help="Title for the recording session.")
     parser.add_argument(
         "-o", "--output-dir",
         type=Path,
         default=DEFAULT_SESSIONS_DIR,
         help=f"Directory to save the session folder (default: {DEFAULT_SESSIONS_DIR})"
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--test-sources",
+        action="store_true",
+        help="Record from videotestsrc/audiotestsrc instead of real devices."
+    )
+    parser.add_argument(
+        "--mic",
+        default=DEFAULT_MIC,
+        help="Microphone: a pulse source name or part of its name or description, e.g. Scarlett."
+    )
+    parser.add_argument(
+        "--system-audio",
+        default=DEFAULT_SYSTEM_AUDIO,
+        help="System audio monitor source, matched like --mic."
+    )
+    parser.add_argument(
+        "--list-devices",
+        action="store_true",
+        help="List the audio sources and exit."
+    )
+    parser.add_argument(
+        "--eos-timeout",
+        type=float,
+        default=DEFAULT_EOS_TIMEOUT,
+        help=f"Seconds to wait for the files to finalize on stop (default: {DEFAULT_EOS_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--offline-clean",
+        action="store_true",
+        help="Clean the mic audio after recording instead of while recording."
+    )
+    parser.add_argument(
+        "--no-proxy",
+        action="store_true",
+        help="Do not record a low-resolution editing proxy alongside the screen."
+    )
+    parser.add_argument(
+        "--segment-time",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="Record in rolling segments of this length so a crash loses at most one."
+    )
+    parser.add_argument(
+        "--segment-size",
+        type=float,
+        default=0,
+        metavar="MB",
+        help="Record in rolling segments of at most this size."
+    )
+    area = parser.add_mutually_exclusive_group()
+    area.add_argument(
+        "--region",
+        metavar="X,Y,W,H",
+        help="Screen area to record, also as WxH+X+Y (default: the built-in 1920x1080+0+768)"
+    )
+    area.add_argument(
+        "--monitor",
+        metavar="NAME",
+        help="Record a whole monitor, by xrandr output name or index."
+    )
+    area.add_argument(
+        "--window-id",
+        type=lambda value: int(value, 0),
+        metavar="XID",
+        help="Record a single window by X id (decimal or 0x hex, see xwininfo)."
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=DEFAULT_FPS,
+        help=f"Screen frame rate (default: {DEFAULT_FPS})"
+    )
+    parser.add_argument(
+        "--damage",
+        action="store_true",
+        help="Copy only the changed parts of the screen; cheaper for mostly static screens."
+    )
+    parser.add_argument(
+        "--dashboard",
+        action="store_true",
+        help="Show live levels, fps and dropped frames in a terminal dashboard."
+    )
+    parser.add_argument(
+        "--preroll",
+        type=float,
+        nargs="?",
+        const=DEFAULT_PREROLL,
+        default=0,
+        metavar="SECONDS",
+        help=(
+            "Arm the sources first and keep this much pre-roll when recording "
+            f"starts (default when given: {DEFAULT_PREROLL:g})"
+        )
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Post-processing jobs to run in parallel (default: {DEFAULT_WORKERS})"
+    )
+    parser.add_argument(
+        "--on-failure",
+        choices=POLICIES,
+        default=FAIL_FAST,
+        help="Stop everything on the first failed job, or only skip its dependents."
+    )
+    parser.add_argument(
+        "--mux-mode",
+        choices=MUX_MODES,
+        default="auto",
+        help="Stream-copy the screen video, re-encode it, or decide from a probe (default: auto)"
+    )
+    parser.add_argument(
+        "--encoder",
+        choices=ENCODER_PRESETS,
+        default=DEFAULT_ENCODER,
+        help=f"Screen encoder preset (default: {DEFAULT_ENCODER})"
+    )
+    parser.add_argument(
+        "--list-encoders",
+        action="store_true",
+        help="List the screen encoder presets and exit."
+    )
+    parser.add_argument(
+        "--benchmark-encoders",
+        type=float,
+        metavar="SECONDS",
+        help="Encode a test pattern with each preset for SECONDS and report fps, CPU and drops."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-run post-processing stages even when a cached result exists."
+    )
+    return parser
+
+
+def record(parser: argparse.ArgumentParser, argv, post_process=True):
+    """
+    Parse the ``capt record`` options in ``argv`` and record. Returns the
+    session folder, or None when only listing or benchmarking.
+    """
+    args = parser.parse_args(argv)
+
+    if args.force:
+        cache.configure(force=True)
+
+    if args.list_encoders:
+        for preset in ENCODER_PRESETS.values():
+            print(f"{preset.name:<14} {preset.description}")
+        return
+    if args.benchmark_encoders:
+        benchmark_encoders(seconds=args.benchmark_encoders)
+        return
+    if args.list_devices:
+        for device in DeviceRegistry().devices():
+            kind = "monitor" if device.monitor else "input"
+            print(f"{kind:<8} {device.name}\n         {device.description}")
+        return
+    if not args.title:
+        parser.error("a title is required to record")
+    registry = None
+    mic_device, system_device = args.mic, args.system_audio
+    if not args.test_sources:
+        # resolve once up front, so a missing device fails before anything starts
+        registry = DeviceRegistry()
+        try:
+            mic = registry.resolve(args.mic, monitor=False)
+            system = registry.resolve(args.system_audio, monitor=True)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Mic: {mic.description} ({mic.name})")
+        print(f"System audio: {system.description} ({system.name})")
+        registry.in_use = {"mic": mic, "system audio": system}
+        mic_device, system_device = mic.name, system.name
+    try:
+        region = DEFAULT_SCREEN.region
+        if args.region:
+            region = parse_region(args.region)
+        elif args.monitor:
+            region = monitor_region(args.monitor)
+    except ValueError as e:
+        parser.error(str(e))
+    screen = ScreenOptions(
+        region=region, window_id=args.window_id, fps=args.fps, use_damage=args.damage
+    )
+
+    return run(
+        args.output_dir,
+        args.title,
+        test_sources=args.test_sources,
+        eos_timeout=args.eos_timeout,
+        live_clean=not args.offline_clean,
+        workers=args.jobs,
+        on_failure=args.on_failure,
+        mux_mode=args.mux_mode,
+        encoder=args.encoder,
+        proxy=not args.no_proxy,
+        segment_time=args.segment_time,
+        segment_bytes=int(args.segment_size * 1024**2),
+        dashboard=args.dashboard,
+        preroll=args.preroll,
+        screen=screen,
+        mic_device=mic_device,
+        system_device=system_device,
+        devices=registry,
+        post_process=post_process,
+    )
+
+
+def main(argv=None):
+    """
+    Entry point of the ``capt`` script: dispatch to a command, recording
+    when the first argument is not one.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else None
+    if command == "record":
+        return record(record_parser("capt record"), argv[1:])
+    if command in reprocess.STAGE_COMMANDS:
+        return reprocess.stage_main(command, argv[1:])
+    if command == "reprocess":
+        return reprocess.main(argv[1:])
+    if command == "workflow":
+        # PyYAML is only needed here
+        from . import workflow
 
-    run(args.output_dir, args.title)
+        return workflow.main(argv[1:])
+    return record(record_parser(), argv)
 
 if __name__ == "__main__":
     # Allows running this module directly, e.g., python -m photon_platform.capture.main "My Test Recording"
@@ -1,10 +1,15 @@
 from jinja2 import Environment, FileSystemLoader, select_autoescape
+from math import gcd
 from pathlib import Path
 import datetime
-import hashlib
 import subprocess
 import os
 
+from .probe import media_duration, media_hash, media_info, stream_frame_rate
+from .roughcut import clock
+from .segments import session_file
+from .transcribe import transcript_paths
+
 
 def launch_shotcut(mlt_file_path):
     """
@@ -20,58 +25,205 @@ def launch_shotcut(mlt_file_path):
         print(f"An error occurred while trying to launch Shotcut: {e}")
 
 
+DEFAULT_CRF = 20
+DEFAULT_PRESET = "medium"
+
+
+def render_mlt(mlt_file: Path, output_file: Path, crf=DEFAULT_CRF, preset=DEFAULT_PRESET) -> Path:
+    """
+    Render an MLT project to an H.264/AAC file with melt.
+
+    A negative ``real_time`` lets melt render on every core without
+    dropping frames.
+    """
+    command = [
+        "melt", str(mlt_file),
+        "-consumer", f"avformat:{output_file}",
+        "vcodec=libx264", f"crf={crf}", f"preset={preset}",
+        "acodec=aac", "ab=192k", "movflags=+faststart",
+        f"real_time=-{os.cpu_count() or 1}",
+    ]
+    subprocess.run(command, check=True)
+    return Path(output_file)
+
+
 def get_audio_duration(file_path):
-    result = subprocess.run(
-        [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            str(file_path),
-        ],
-        capture_output=True,
-        text=True,
-    )
-    duration = float(result.stdout)
-    return duration
+    return media_duration(file_path)
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+TEMPLATE_NAME = "mlt_template.xml"
+DEFAULT_PROFILE = {"width": 1920, "height": 1080, "frame_rate_num": 25, "frame_rate_den": 1}
+# Shotcut looks for proxies in <project folder>/proxies/<shotcut:hash>.mp4
+PROXY_DIR = "proxies"
+
+# one environment for the process; it keeps the compiled templates and,
+# without auto_reload, never checks the files again
+_environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["xml"]),
+    auto_reload=False,
+)
 
 
 def get_template_path():
-    return os.path.join(os.path.dirname(__file__), "templates", "mlt_template.xml")
+    return os.path.join(TEMPLATE_DIR, TEMPLATE_NAME)
 
 
-def generate_mlt_file(mic_clean_file: Path, output_file: Path):
-    template_path = get_template_path()
-    template_dir = os.path.dirname(template_path)
+def get_template(name=TEMPLATE_NAME):
+    """
+    The compiled template ``name``, compiled once per process by the
+    environment's template cache.
+    """
+    return _environment.get_template(name)
+
 
-    env = Environment(
-        loader=FileSystemLoader(template_dir), autoescape=select_autoescape(["xml"])
+def proxy_path(file_path: Path) -> Path:
+    """
+    Where Shotcut expects the proxy of ``file_path``, named by its hash.
+    """
+    file_path = Path(file_path)
+    return file_path.parent / PROXY_DIR / f"{media_hash(file_path)}.mp4"
+
+
+def media_context(file_path: Path, output_dir: Path, fps: float) -> dict:
+    """
+    Template values for one chain, filled from the cached probe and hash.
+    """
+    info = media_info(file_path, with_hash=True)
+    duration = info["duration"]
+    context = {
+        "resource": os.path.relpath(file_path, start=output_dir),
+        "name": Path(file_path).name,
+        "length": clock(duration),
+        "out": clock(max(duration - 1 / fps, 0)),
+        "duration": duration,
+        "hash": info["md5"],
+        "streams": [],
+        "audio_index": -1,
+        "video_index": -1,
+    }
+    proxy = proxy_path(file_path)
+    if proxy.exists():
+        context["proxy"] = os.path.relpath(proxy, start=output_dir)
+    for index, stream in enumerate(info["probe"].get("streams", [])):
+        kind = stream.get("codec_type", "data")
+        values = {
+            "type": kind,
+            "codec_name": stream.get("codec_name", ""),
+            "codec_long_name": stream.get("codec_long_name", ""),
+            "bit_rate": stream.get("bit_rate", 0),
+        }
+        if kind == "video":
+            num, den = stream_frame_rate(stream) or (
+                DEFAULT_PROFILE["frame_rate_num"], DEFAULT_PROFILE["frame_rate_den"]
+            )
+            values.update(
+                width=stream.get("width", 0),
+                height=stream.get("height", 0),
+                pix_fmt=stream.get("pix_fmt", ""),
+                frame_rate=f"{num / den:g}",
+            )
+            if context["video_index"] < 0:
+                context.update(
+                    video_index=index,
+                    width=values["width"],
+                    height=values["height"],
+                    frame_rate_num=num,
+                    frame_rate_den=den,
+                )
+        elif kind == "audio":
+            values.update(
+                sample_fmt=stream.get("sample_fmt", ""),
+                sample_rate=stream.get("sample_rate", 0),
+                channels=stream.get("channels", 0),
+            )
+            if context["audio_index"] < 0:
+                context["audio_index"] = index
+        context["streams"].append(values)
+    return context
+
+
+def session_profile(video_file: Path = None) -> dict:
+    """
+    MLT profile matching the first video stream of ``video_file``.
+    """
+    profile = dict(DEFAULT_PROFILE)
+    if video_file is not None:
+        for stream in media_info(video_file)["probe"].get("streams", []):
+            if stream.get("codec_type") == "video":
+                rate = stream_frame_rate(stream)
+                if rate:
+                    profile["frame_rate_num"], profile["frame_rate_den"] = rate
+                profile["width"] = stream.get("width") or profile["width"]
+                profile["height"] = stream.get("height") or profile["height"]
+                break
+    aspect = gcd(profile["width"], profile["height"])
+    fps = profile["frame_rate_num"] / profile["frame_rate_den"]
+    profile.update(
+        display_aspect_num=profile["width"] // aspect,
+        display_aspect_den=profile["height"] // aspect,
+        description=f"{profile['width']}x{profile['height']} {fps:g} fps",
     )
-    template = env.get_template(os.path.basename(template_path))
+    return profile
 
-    duration_seconds = get_audio_duration(mic_clean_file)
-    duration = f"{int(duration_seconds // 3600):02d}:{int((duration_seconds % 3600) // 60):02d}:{duration_seconds % 60:06.3f}"
-    length = f"{duration}.{int((duration_seconds % 1) * 1000):03d}"
 
-    with open(mic_clean_file, "rb") as f:
-        file_hash = hashlib.md5(f.read()).hexdigest()
+def generate_mlt_file(
+    mic_clean_file: Path,
+    output_file: Path,
+    video_file: Path = None,
+    overlays=(),
+    subtitles: Path = None,
+):
+    """
+    Render a Shotcut project with the clean mic on A1, the screen video with
+    system audio on V1 and any generated ``overlays`` on the tracks above.
 
-    # Use relative path for mic_clean_file
-    relative_mic_clean_file = os.path.relpath(mic_clean_file, start=output_file.parent)
+    Every chain is filled from the probed media, so the resources, stream
+    metadata, hashes and profile match the session. Media with a proxy in
+    ``proxies/`` open on the proxy, the way Shotcut itself references them.
+    ``video_file`` defaults to ``system_video_audio.mkv`` next to the mic,
+    falling back to ``screen.mkv`` or its segment manifest.
 
+    ``subtitles``, an SRT file, becomes the project's subtitle track; it
+    defaults to the mic's transcript when one has been made.
+    """
+    mic_clean_file = Path(mic_clean_file)
+    output_file = Path(output_file)
+    if video_file is None:
+        for name in ("system_video_audio.mkv", "screen.mkv"):
+            if session_file(mic_clean_file.parent, name).exists():
+                video_file = session_file(mic_clean_file.parent, name)
+                break
+
+    if subtitles is None and transcript_paths(mic_clean_file)["srt"].exists():
+        subtitles = transcript_paths(mic_clean_file)["srt"]
+
+    profile = session_profile(video_file)
+    fps = profile["frame_rate_num"] / profile["frame_rate_den"]
+    output_dir = output_file.parent
+
+    tracks = [{"kind": "audio", "name": "A1", "media": media_context(mic_clean_file, output_dir, fps)}]
+    videos = ([video_file] if video_file is not None else []) + list(overlays)
+    for index, path in enumerate(videos):
+        tracks.append({
+            "kind": "video",
+            "name": f"V{index + 1}",
+            "base": index == 0,
+            "media": media_context(path, output_dir, fps),
+        })
+
+    duration = max(track["media"]["duration"] for track in tracks)
     context = {
-        "mic_clean_file": relative_mic_clean_file,
-        "mic_clean_filename": mic_clean_file.name,
-        "duration": duration,
-        "length": length,
+        "profile": profile,
+        "tracks": tracks,
+        "length": clock(duration),
+        "out": clock(max(duration - 1 / fps, 0)),
         "creation_time": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-        "hash": file_hash,
+        "subtitles": Path(subtitles).read_text() if subtitles else None,
     }
 
-    output = template.render(context)
+    output = get_template().render(context)
 
     with open(output_file, "w") as f:
         f.write(output)
@@ -0,0 +1,131 @@
+"""
+Armed capture with a pre-roll ring buffer.
+
+In armed mode the session pipeline is already PLAYING: every branch runs
+into a leaky queue holding the last few seconds and blocked on its output.
+Starting the recording just unblocks the queues, so the buffered pre-roll is
+written first and nothing said while the pipeline was starting is lost.
+
+The audio queues hold raw audio (after the level meter, before the live
+cleaner tee); the screen and proxy queues hold encoded video, which keeps
+memory small. While armed the video encoders are asked for a keyframe every
+second, and on release the video is written from the oldest keyframe still
+buffered, so the files decode from their first frame.
+"""
+from . import gst
+
+DEFAULT_PREROLL = 5.0
+DEFAULT_MAX_BYTES = 64 * 1024**2  # cap per queue
+KEYFRAME_INTERVAL = 1.0
+
+# element names used by capture.configure_session_pipeline
+AUDIO_QUEUES = ("mic_preroll", "system_preroll")
+VIDEO_QUEUES = ("screen_preroll", "proxy_preroll")
+
+
+def preroll_queue(name: str, seconds=DEFAULT_PREROLL, max_bytes=DEFAULT_MAX_BYTES) -> str:
+    """
+    Launch fragment for a ring buffer of ``seconds``, bounded to
+    ``max_bytes``; the oldest buffers are dropped once either is reached.
+    """
+    return (
+        f"queue name={name} leaky=downstream max-size-buffers=0 "
+        f"max-size-time={int(seconds * gst.Gst.SECOND)} max-size-bytes={int(max_bytes)} ! "
+    )
+
+
+def _megabytes(size):
+    return size / 1024**2
+
+
+class Preroll:
+    """
+    Hold the pre-roll queues of ``pipeline`` until :meth:`release`.
+    """
+
+    def __init__(self, pipeline):
+        self.queues = {}
+        for name in AUDIO_QUEUES + VIDEO_QUEUES:
+            queue = pipeline.get_by_name(name)
+            if queue is not None:
+                self.queues[name] = queue
+        self._probes = {}
+        self._keyframe_timer = None
+
+    @property
+    def armed(self):
+        return bool(self._probes)
+
+    def arm(self):
+        """
+        Block every pre-roll queue; call before setting the pipeline PLAYING.
+        """
+        for name, queue in self.queues.items():
+            pad = queue.get_static_pad("src")
+            self._probes[name] = pad.add_probe(
+                gst.Gst.PadProbeType.BLOCK_DOWNSTREAM | gst.Gst.PadProbeType.BUFFER,
+                lambda pad, info: gst.Gst.PadProbeReturn.OK,
+            )
+        if any(name in self.queues for name in VIDEO_QUEUES):
+            self._keyframe_timer = gst.GLib.timeout_add(
+                int(KEYFRAME_INTERVAL * 1000), self._request_keyframes
+            )
+
+    def _request_keyframes(self):
+        for name in VIDEO_QUEUES:
+            if name in self.queues:
+                event = gst.GstVideo.video_event_new_upstream_force_key_unit(
+                    gst.Gst.CLOCK_TIME_NONE, True, 0
+                )
+                self.queues[name].get_static_pad("src").send_event(event)
+        return self.armed
+
+    def buffered(self) -> dict:
+        """
+        ``name: (seconds, bytes)`` held by each queue right now.
+        """
+        return {
+            name: (
+                queue.get_property("current-level-time") / gst.Gst.SECOND,
+                queue.get_property("current-level-bytes"),
+            )
+            for name, queue in self.queues.items()
+        }
+
+    def limit_bytes(self) -> int:
+        """
+        The most memory the pre-roll can hold, from the queue caps.
+        """
+        return sum(queue.get_property("max-size-bytes") for queue in self.queues.values())
+
+    def report(self) -> str:
+        levels = self.buffered()
+        seconds = min((s for s, _ in levels.values()), default=0.0)
+        used = sum(size for _, size in levels.values())
+        return (
+            f"Pre-roll: {seconds:.1f}s buffered, {_megabytes(used):.1f} MB "
+            f"of at most {_megabytes(self.limit_bytes()):.0f} MB"
+        )
+
+    def release(self) -> str:
+        """
+        Start recording: let the buffered pre-roll and everything after it
+        through to the files. Returns the :meth:`report` at release.
+        """
+        report = self.report()
+        if self._keyframe_timer is not None:
+            gst.GLib.source_remove(self._keyframe_timer)
+            self._keyframe_timer = None
+        for name, probe in self._probes.items():
+            pad = self.queues[name].get_static_pad("src")
+            if name in VIDEO_QUEUES:
+                pad.add_probe(gst.Gst.PadProbeType.BUFFER, _drop_until_keyframe)
+            pad.remove_probe(probe)
+        self._probes.clear()
+        return report
+
+
+def _drop_until_keyframe(pad, info):
+    if info.get_buffer().has_flags(gst.Gst.BufferFlags.DELTA_UNIT):
+        return gst.Gst.PadProbeReturn.DROP
+    return gst.Gst.PadProbeReturn.REMOVE
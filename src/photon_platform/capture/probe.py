@@ -0,0 +1,146 @@
+"""
+ffprobe helpers for inspecting captured media.
+
+:func:`media_info` keeps a per-session metadata cache so every stage shares
+one probe and one hash per file. Entries live in memory and in a
+``.media.json`` next to the media, and are dropped when the file's size or
+mtime changes.
+"""
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+from .hashing import file_md5
+
+CACHE_NAME = ".media.json"
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def probe_media(file_path: Path) -> dict:
+    """
+    Return ffprobe's format and stream description of ``file_path``.
+    """
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_format",
+            "-show_streams",
+            "-of",
+            "json",
+            str(file_path),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def stream_codecs(info: dict, codec_type: str) -> list:
+    """
+    Codec names of the ``audio`` or ``video`` streams in a probe result.
+    """
+    return [
+        stream.get("codec_name")
+        for stream in info.get("streams", [])
+        if stream.get("codec_type") == codec_type
+    ]
+
+
+def stream_frame_rate(stream: dict):
+    """
+    ``(num, den)`` frame rate of a probed video stream, or None when the
+    container reports nothing usable (ximagesrc captures often do not).
+    """
+    for key in ("avg_frame_rate", "r_frame_rate"):
+        num, _, den = stream.get(key, "0/0").partition("/")
+        try:
+            num, den = int(num), int(den or 1)
+        except ValueError:
+            continue
+        if den and 1 <= num / den <= 120:
+            return num, den
+    return None
+
+
+def _session_cache(folder: Path) -> dict:
+    folder = str(folder)
+    if folder not in _sessions:
+        try:
+            _sessions[folder] = json.loads(Path(folder, CACHE_NAME).read_text())
+        except (OSError, ValueError):
+            _sessions[folder] = {}
+    return _sessions[folder]
+
+
+def _save_session_cache(folder: Path):
+    cache_file = Path(folder, CACHE_NAME)
+    tmp = cache_file.with_name(cache_file.name + f".{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps(_sessions[str(folder)], indent=2))
+        os.replace(tmp, cache_file)
+    except OSError:
+        # a read-only archive still benefits from the in-memory cache
+        pass
+
+
+def _cached_entry(file_path: Path):
+    """
+    The cache entry for ``file_path`` if it still matches the file, else a
+    fresh one stamped with the current size and mtime.
+    """
+    stat = file_path.stat()
+    cache = _session_cache(file_path.parent)
+    entry = cache.get(file_path.name)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry
+    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    cache[file_path.name] = entry
+    return entry
+
+
+def media_info(file_path: Path, with_hash=False, with_probe=True) -> dict:
+    """
+    Cached metadata for ``file_path``: the ffprobe result under ``probe``,
+    plus ``duration`` and, when asked for or already known, ``md5``.
+
+    Each file is probed and hashed at most once while it is unchanged.
+    """
+    file_path = Path(file_path).resolve()
+    with _lock:
+        entry = dict(_cached_entry(file_path))
+
+    updates = {}
+    if with_probe and "probe" not in entry:
+        updates["probe"] = probe_media(file_path)
+        updates["duration"] = float(updates["probe"].get("format", {}).get("duration", 0.0))
+    if with_hash and "md5" not in entry:
+        updates["md5"] = file_md5(file_path)
+    if not updates:
+        return entry
+
+    with _lock:
+        cached = _cached_entry(file_path)
+        cached.update(updates)
+        _save_session_cache(file_path.parent)
+        return dict(cached)
+
+
+def media_duration(file_path: Path) -> float:
+    """
+    Duration in seconds, from the cached probe.
+    """
+    return media_info(file_path)["duration"]
+
+
+def media_hash(file_path: Path) -> str:
+    """
+    MD5 of the whole file, hashed in chunks and cached.
+    """
+    return media_info(file_path, with_hash=True, with_probe=False)["md5"]
@@ -0,0 +1,537 @@
+"""
+Re-run post-processing over archived session folders.
+
+Each session keeps a ``.stages.json`` manifest recording, per stage, a key
+made from the hashes of the stage's inputs and its parameters. A stage is
+stale when its key changed, its output is missing, or a stage it depends on
+is stale; only stale stages run. The manifest is updated after every stage,
+so an interrupted run resumes where it stopped.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+from typing import Callable
+
+from . import cache
+from .capture import (
+    MIC_CLEAN_FILTERS,
+    MUX_MODES,
+    clean_mic_audio,
+    combine_video_system_audio,
+    make_proxy,
+)
+from .composite import render_waves_composite
+from .envelope import DEFAULT_FRAME, build_envelope
+from .mlt_generator import (
+    DEFAULT_CRF,
+    DEFAULT_PRESET,
+    generate_mlt_file,
+    get_template_path,
+    render_mlt,
+)
+from .probe import media_hash
+from .roughcut import DEFAULT_FADE, DEFAULT_PADDING, rough_cut
+from .segments import is_manifest, manifest_path, session_file, source_files
+from .silence import DEFAULT_MIN_SILENCE, DEFAULT_NOISE_FLOOR
+from .transcribe import DEFAULT_MODEL, transcribe, transcript_paths
+from .transcribe import DEFAULT_PADDING as TRANSCRIBE_PADDING
+
+SESSION_PATTERN = re.compile(r"^\d{2}\.\d{3}\.\d{6}_(?P<slug>.+)$")
+MANIFEST_NAME = ".stages.json"
+
+
+@dataclass
+class Stage:
+    name: str
+    inputs: tuple
+    output: str
+    run: Callable
+    params: dict = field(default_factory=dict)
+    after: tuple = ()
+    default: bool = True  # run when no stages are named
+
+
+STAGE_NAMES = (
+    "clean", "mux", "proxy", "envelope", "transcribe", "mlt", "roughcut", "waves", "render",
+)
+RENDER_SOURCES = ("roughcut", "mlt")
+
+
+def _template_version():
+    with open(get_template_path(), "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def _resolution(value):
+    """
+    ``WIDTHxHEIGHT`` to a ``(width, height)`` tuple, None for the layout's
+    own size.
+    """
+    if value is None:
+        return None
+    match = re.fullmatch(r"(\d+)x(\d+)", str(value).strip())
+    if not match or 0 in map(int, match.groups()):
+        raise ValueError(f"resolution '{value}' is not WIDTHxHEIGHT")
+    return tuple(map(int, match.groups()))
+
+
+def _stage_options(options: dict, name: str, **defaults) -> dict:
+    given = dict(options.get(name) or {})
+    unknown = sorted(set(given) - set(defaults))
+    if unknown:
+        raise ValueError(
+            f"unknown options for stage '{name}': {', '.join(unknown)} "
+            f"(expected {', '.join(defaults) or 'none'})"
+        )
+    return {**defaults, **given}
+
+
+def stage_options(options=None) -> dict:
+    """
+    The options of every stage, ``options`` (stage name to keyword
+    arguments) laid over the defaults.
+
+    Raises ValueError for an unknown stage or option.
+    """
+    options = options or {}
+    unknown = sorted(set(options) - set(STAGE_NAMES))
+    if unknown:
+        raise ValueError(f"unknown stages: {', '.join(unknown)} (expected {', '.join(STAGE_NAMES)})")
+    resolved = {
+        "clean": _stage_options(options, "clean"),
+        "mux": _stage_options(options, "mux", mode="auto"),
+        "proxy": _stage_options(options, "proxy"),
+        "envelope": _stage_options(options, "envelope", frame=DEFAULT_FRAME),
+        "transcribe": _stage_options(
+            options, "transcribe",
+            model=DEFAULT_MODEL,
+            padding=TRANSCRIBE_PADDING,
+        ),
+        "mlt": _stage_options(options, "mlt"),
+        "roughcut": _stage_options(
+            options, "roughcut",
+            noise_floor=DEFAULT_NOISE_FLOOR,
+            min_silence=DEFAULT_MIN_SILENCE,
+            padding=DEFAULT_PADDING,
+            fade=DEFAULT_FADE,
+        ),
+        "waves": _stage_options(options, "waves", resolution=None),
+        "render": _stage_options(
+            options, "render", source="roughcut", crf=DEFAULT_CRF, preset=DEFAULT_PRESET
+        ),
+    }
+    if resolved["mux"]["mode"] not in MUX_MODES:
+        raise ValueError(f"mux mode must be one of {', '.join(MUX_MODES)}")
+    if resolved["render"]["source"] not in RENDER_SOURCES:
+        raise ValueError(f"render source must be one of {', '.join(RENDER_SOURCES)}")
+    _resolution(resolved["waves"]["resolution"])
+    return resolved
+
+
+def session_stages(folder: Path, options=None) -> list:
+    """
+    The post-processing stages of a session folder, in dependency order.
+
+    ``options`` maps stage names to keyword arguments for the stage, e.g.
+    ``{"roughcut": {"padding": 0.3}}``; they are part of the stage key, so
+    changing them makes the stage stale.
+    """
+    options = stage_options(options)
+    mux, envelope, transcription, roughcut, waves, render = (
+        options[name] for name in ("mux", "envelope", "transcribe", "roughcut", "waves", "render")
+    )
+
+    slug = SESSION_PATTERN.match(folder.name).group("slug")
+    # segmented recordings are read through their manifests
+    mic, screen, system = (
+        session_file(folder, name).name for name in ("mic.ogg", "screen.mkv", "system.ogg")
+    )
+    projects = {"mlt": f"{slug}.mlt", "roughcut": f"{slug}_roughcut.mlt"}
+    composite = f"{slug}_waves.mp4"
+    project = projects[render["source"]]
+    return [
+        Stage(
+            "clean", (mic,), "mic_clean.ogg",
+            lambda: clean_mic_audio(folder / mic),
+            {"filters": MIC_CLEAN_FILTERS},
+        ),
+        Stage(
+            "mux", (screen, system), "system_video_audio.mkv",
+            lambda: combine_video_system_audio(
+                folder / screen, folder / system, folder / "system_video_audio.mkv", **mux
+            ),
+            mux,
+        ),
+        Stage(
+            "proxy", ("proxy.mkv", system, "system_video_audio.mkv"), "proxies",
+            lambda: make_proxy(
+                folder / "proxy.mkv", folder / system, folder / "system_video_audio.mkv"
+            ),
+            after=("mux",),
+        ),
+        Stage(
+            "envelope", ("mic_clean.ogg",), "mic_clean.ogg.env",
+            lambda: build_envelope(folder / "mic_clean.ogg", **envelope),
+            envelope,
+            after=("clean",),
+        ),
+        # needs Vosk and a model, so only on request
+        Stage(
+            "transcribe", ("mic_clean.ogg",), transcript_paths(Path("mic_clean.ogg"))["words"].name,
+            lambda: transcribe(folder / "mic_clean.ogg", **transcription),
+            transcription,
+            after=("envelope",),
+            default=False,
+        ),
+        Stage(
+            "mlt", ("mic_clean.ogg", "system_video_audio.mkv"), projects["mlt"],
+            lambda: generate_mlt_file(folder / "mic_clean.ogg", folder / projects["mlt"]),
+            {"template": _template_version()},
+            after=("clean", "mux", "proxy", "transcribe"),
+        ),
+        Stage(
+            "roughcut", ("mic_clean.ogg", screen, system), projects["roughcut"],
+            lambda: rough_cut(folder, folder / projects["roughcut"], **roughcut),
+            roughcut,
+            after=("envelope",),
+        ),
+        # a full re-encode of the screen, so only on request
+        Stage(
+            "waves", (screen, "mic_clean.ogg", system), composite,
+            lambda: render_waves_composite(
+                folder / composite, folder / screen, folder / "mic_clean.ogg", folder / system,
+                resolution=_resolution(waves["resolution"]),
+            ),
+            waves,
+            after=("clean",),
+            default=False,
+        ),
+        # rendering is slow and only wanted for some sessions, so only on request
+        Stage(
+            "render", (project,), Path(project).with_suffix(".mp4").name,
+            lambda: render_mlt(
+                folder / project, folder / Path(project).with_suffix(".mp4").name,
+                crf=render["crf"], preset=render["preset"],
+            ),
+            render,
+            after=(render["source"],),
+            default=False,
+        ),
+    ]
+
+
+def find_sessions(roots) -> list:
+    """
+    Session folders (``YY.JJJ.HHMMSS_slug`` holding a ``mic.ogg`` or its
+    segment manifest) under ``roots``, sorted by name.
+    """
+    mic_names = {"mic.ogg", manifest_path(Path("mic.ogg")).name}
+    sessions = []
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            if SESSION_PATTERN.match(os.path.basename(dirpath)) and mic_names & set(filenames):
+                sessions.append(Path(dirpath))
+                dirnames.clear()
+    return sorted(sessions, key=lambda path: path.name)
+
+
+def _read_manifest(folder: Path) -> dict:
+    try:
+        return json.loads((folder / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(folder: Path, manifest: dict):
+    tmp = folder / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, folder / MANIFEST_NAME)
+
+
+def stage_key(folder: Path, stage: Stage):
+    """
+    Key of a stage from its parameters and input hashes, or None when an
+    input is missing.
+
+    A segment manifest is hashed together with the segments it lists, since
+    a segment can change without the manifest changing.
+    """
+    inputs = {}
+    for name in stage.inputs:
+        if not (folder / name).exists():
+            return None
+        inputs[name] = media_hash(folder / name)
+        if is_manifest(folder / name):
+            segments = source_files(folder / name)
+            if not all(path.exists() for path in segments):
+                return None
+            inputs[name] = [inputs[name]] + [media_hash(path) for path in segments]
+    payload = json.dumps({"params": stage.params, "inputs": inputs}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def select_stages(folder: Path, names=None, options=None) -> list:
+    """
+    The stages of ``folder`` named in ``names``, in dependency order, or the
+    default stages when ``names`` is None.
+    """
+    stages = session_stages(folder, options)
+    if names is None:
+        return [stage for stage in stages if stage.default]
+    unknown = sorted(set(names) - set(STAGE_NAMES))
+    if unknown:
+        raise ValueError(f"unknown stages: {', '.join(unknown)} (expected {', '.join(STAGE_NAMES)})")
+    return [stage for stage in stages if stage.name in names]
+
+
+def stale_stages(folder: Path, force=False, names=None, options=None) -> list:
+    """
+    ``(stage, reason)`` for every selected stage that needs to run.
+
+    Stages downstream of a stale stage are stale too, since their inputs
+    are about to change. ``force`` marks every runnable stage stale.
+    """
+    manifest = _read_manifest(folder)
+    stale = []
+    stale_names, produced = set(), set()
+    for stage in select_stages(folder, names, options):
+        upstream = [name for name in stage.after if name in stale_names]
+        missing = [
+            name for name in stage.inputs
+            if not (folder / name).exists() and name not in produced
+        ]
+        if missing:
+            # nothing to work from and no stale stage will make it, e.g. an
+            # audio-only session has no mux, an archived one no proxy.mkv
+            continue
+        if force:
+            reason = "forced"
+        elif upstream:
+            reason = f"after {', '.join(upstream)}"
+        elif not (folder / stage.output).exists():
+            reason = "output missing"
+        elif manifest.get(stage.name, {}).get("key") != stage_key(folder, stage):
+            reason = "inputs or parameters changed"
+        else:
+            continue
+        stale.append((stage, reason))
+        stale_names.add(stage.name)
+        produced.add(stage.output)
+    return stale
+
+
+def mark_done(folder: Path, name: str, options=None):
+    """
+    Record stage ``name`` as up to date in the session manifest, e.g. after
+    the mic was cleaned live while recording.
+    """
+    stage = select_stages(folder, (name,), options)[0]
+    manifest = _read_manifest(folder)
+    manifest[stage.name] = {
+        "key": stage_key(folder, stage),
+        "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    _write_manifest(folder, manifest)
+
+
+def reprocess_session(folder: Path, force=False, names=None, options=None) -> list:
+    """
+    Run the stale stages of one session, recording each in the manifest as
+    soon as it finishes. Returns the names of the stages run.
+
+    ``names`` and ``options`` select and configure the stages as in
+    :func:`select_stages`. ``force`` re-runs them and bypasses the stage
+    cache.
+    """
+    cache.configure(force=force)
+    done = []
+    for stage, reason in stale_stages(folder, force, names, options):
+        print(f"{folder.name}: {stage.name} ({reason})")
+        stage.run()
+        mark_done(folder, stage.name, options)
+        done.append(stage.name)
+    return done
+
+
+def reprocess_sessions(sessions, jobs=None, force=False, names=None, options=None) -> list:
+    """
+    :func:`reprocess_session` over ``sessions`` on a process pool. Returns
+    the sessions that failed.
+    """
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        futures = {
+            pool.submit(reprocess_session, folder, force, names, options): folder
+            for folder in sessions
+        }
+        for future in as_completed(futures):
+            folder = futures[future]
+            try:
+                ran = future.result()
+                if ran:
+                    print(f"{folder.name}: done ({', '.join(ran)})")
+            except Exception as e:
+                print(f"{folder.name}: FAILED: {e}")
+                failed.append(folder)
+    return failed
+
+
+def stage_list(value: str) -> tuple:
+    """
+    argparse type for a comma-separated list of stage names.
+    """
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in names if name not in STAGE_NAMES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown stages: {', '.join(unknown)} (expected {', '.join(STAGE_NAMES)})"
+        )
+    return names
+
+
+def main(argv=None):
+    """
+    ``capt reprocess``: bring archived sessions up to date.
+    """
+    parser = argparse.ArgumentParser(
+        prog="capt reprocess",
+        description="Re-run stale post-processing stages across session folders.",
+    )
+    parser.add_argument("roots", nargs="+", type=Path, help="Folders to search for sessions.")
+    parser.add_argument(
+        "-n", "--dry-run", action="store_true", help="List the stale stages without running them."
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="Sessions to process in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--stages", type=stage_list, metavar="NAME,...",
+        help=(
+            f"Stages to consider, from {', '.join(STAGE_NAMES)} "
+            "(default: all but transcribe, waves and render)"
+        ),
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Re-run every stage, ignoring the manifest and the stage cache.",
+    )
+    args = parser.parse_args(argv)
+
+    sessions = find_sessions(args.roots)
+    print(f"Found {len(sessions)} session folders.")
+
+    if args.dry_run:
+        for folder in sessions:
+            for stage, reason in stale_stages(folder, args.force, args.stages):
+                print(f"{folder}: {stage.name} ({reason})")
+        return
+
+    failed = reprocess_sessions(sessions, args.jobs, args.force, args.stages)
+    if failed:
+        print(f"{len(failed)} sessions failed; run again to resume them.")
+        raise SystemExit(1)
+
+
+# subcommands running a single stage, and the stage each runs
+STAGE_COMMANDS = {
+    "clean": "clean",
+    "mux": "mux",
+    "transcribe": "transcribe",
+    "rough-cut": "roughcut",
+    "waves": "waves",
+    "render": "render",
+}
+STAGE_DESCRIPTIONS = {
+    "clean": "Clean the mic audio of session folders.",
+    "mux": "Attach the system audio to the screen video of session folders.",
+    "transcribe": "Transcribe the clean mic of session folders into subtitles and word timings.",
+    "roughcut": "Cut the silences out of session folders into a rough-cut MLT project.",
+    "waves": "Render the screen with the mic and system waveforms overlaid, for session folders.",
+    "render": "Render the rough cut (or the full MLT project) of session folders with melt.",
+}
+
+
+def stage_main(command: str, argv=None):
+    """
+    ``capt clean``, ``mux``, ``transcribe``, ``rough-cut``, ``waves`` and ``render``:
+    run one stage over existing session folders, e.g. a heavy stage on a
+    machine other than the one that captured. Stages it depends on are not
+    run; their outputs must already be in the folder.
+    """
+    name = STAGE_COMMANDS[command]
+    parser = argparse.ArgumentParser(prog=f"capt {command}", description=STAGE_DESCRIPTIONS[name])
+    parser.add_argument("sessions", nargs="+", type=Path, help="Session folders.")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="Sessions to process in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Run even when the stage is up to date, bypassing the stage cache.",
+    )
+    # options default to None so the stage defaults apply
+    if name == "mux":
+        parser.add_argument(
+            "--mode", choices=MUX_MODES, help="Copy or re-encode the video (default: auto)"
+        )
+    elif name == "transcribe":
+        parser.add_argument(
+            "--model", help="Vosk model folder (default: $CAPTURE_VOSK_MODEL)"
+        )
+        parser.add_argument(
+            "--padding", type=float,
+            help=f"Seconds transcribed around speech (default: {TRANSCRIBE_PADDING})",
+        )
+    elif name == "roughcut":
+        parser.add_argument(
+            "--noise-floor", type=float,
+            help=f"dBFS below which audio is silence (default: {DEFAULT_NOISE_FLOOR})",
+        )
+        parser.add_argument(
+            "--min-silence", type=float,
+            help=f"Shortest silence to cut, in seconds (default: {DEFAULT_MIN_SILENCE})",
+        )
+        parser.add_argument(
+            "--padding", type=float, help=f"Seconds kept around speech (default: {DEFAULT_PADDING})"
+        )
+        parser.add_argument(
+            "--fade", type=float, help=f"Fade at each cut, in seconds (default: {DEFAULT_FADE})"
+        )
+    elif name == "waves":
+        parser.add_argument(
+            "--resolution", metavar="WIDTHxHEIGHT", help="Output size (default: 1920x1080)"
+        )
+    elif name == "render":
+        parser.add_argument(
+            "--source", choices=RENDER_SOURCES, help="Project to render (default: roughcut)"
+        )
+        parser.add_argument("--crf", type=int, help=f"x264 quality (default: {DEFAULT_CRF})")
+        parser.add_argument("--preset", help=f"x264 preset (default: {DEFAULT_PRESET})")
+    args = parser.parse_args(argv)
+
+    general = {"sessions", "jobs", "force"}
+    options = {
+        name: {key: value for key, value in vars(args).items() if key not in general and value is not None}
+    }
+    sessions = []
+    for folder in args.sessions:
+        if not SESSION_PATTERN.match(folder.resolve().name):
+            parser.error(f"{folder} is not a session folder (YY.JJJ.HHMMSS_slug)")
+        folder = folder.resolve()
+        stage = select_stages(folder, (name,), options)[0]
+        missing = [file for file in stage.inputs if not (folder / file).exists()]
+        if missing:
+            print(f"{folder.name}: skipped, missing {', '.join(missing)}")
+            continue
+        sessions.append(folder)
+
+    failed = reprocess_sessions(sessions, args.jobs, args.force, (name,), options)
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,244 @@
+"""
+Rough-cut a session into a multi-track Shotcut/melt project.
+
+Speech segments found on the clean mic envelope are padded, merged and
+snapped to frames, then the same cut list is applied to every track, so mic,
+screen and system audio stay in lockstep.
+"""
+from math import gcd
+from pathlib import Path
+import os
+import xml.etree.ElementTree as ET
+
+from .probe import media_duration, media_info, stream_frame_rate
+from .segments import session_file
+from .silence import DEFAULT_MIN_SILENCE, DEFAULT_NOISE_FLOOR, detect_speech
+
+DEFAULT_PADDING = 0.25  # seconds kept before and after speech
+DEFAULT_FADE = 0.05  # seconds of audio fade at each cut
+DEFAULT_FPS = 25
+
+
+def pad_segments(segments, padding=DEFAULT_PADDING, duration=None):
+    """
+    Widen each ``(start, end)`` by ``padding`` and merge the overlaps.
+    """
+    padded = []
+    for start, end in segments:
+        start = max(0.0, start - padding)
+        end = end + padding if duration is None else min(duration, end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], max(padded[-1][1], end))
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def to_frames(segments, fps):
+    """
+    Snap second-based segments to ``(in, out)`` frames, ``out`` inclusive.
+    """
+    frames = []
+    for start, end in segments:
+        first, last = int(round(start * fps)), int(round(end * fps)) - 1
+        if last >= first:
+            frames.append((first, last))
+    return frames
+
+
+def clock(seconds: float) -> str:
+    """
+    MLT clock value ``HH:MM:SS.mmm``.
+    """
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def probe_fps(video_file: Path, default=DEFAULT_FPS) -> float:
+    """
+    Frame rate of the first video stream, or ``default`` when the container
+    does not report a usable one (ximagesrc captures often do not).
+    """
+    for stream in media_info(video_file)["probe"].get("streams", []):
+        if stream.get("codec_type") != "video":
+            continue
+        rate = stream_frame_rate(stream)
+        if rate:
+            return rate[0] / rate[1]
+    return default
+
+
+def _property(parent, name, value):
+    ET.SubElement(parent, "property", name=name).text = str(value)
+
+
+def _fade_filters(entry, length_frames, fps, fade):
+    fade_frames = int(round(fade * fps))
+    if not fade_frames or length_frames <= 2 * fade_frames:
+        return
+    fade_clock = clock(fade_frames / fps)
+    fade_in = ET.SubElement(entry, "filter", out=clock((fade_frames - 1) / fps))
+    _property(fade_in, "window", 75)
+    _property(fade_in, "max_gain", "20dB")
+    _property(fade_in, "level", f"00:00:00.000=-60;{fade_clock}=0")
+    _property(fade_in, "mlt_service", "volume")
+    _property(fade_in, "shotcut:filter", "fadeInVolume")
+    _property(fade_in, "shotcut:animIn", fade_clock)
+
+    start = (length_frames - fade_frames) / fps
+    fade_out = ET.SubElement(
+        entry, "filter", **{"in": clock(start), "out": clock((length_frames - 1) / fps)}
+    )
+    _property(fade_out, "window", 75)
+    _property(fade_out, "max_gain", "20dB")
+    _property(fade_out, "level", f"00:00:00.000=0;{fade_clock}=-60")
+    _property(fade_out, "mlt_service", "volume")
+    _property(fade_out, "shotcut:filter", "fadeOutVolume")
+    _property(fade_out, "shotcut:animOut", fade_clock)
+
+
+def write_roughcut(output_file: Path, cuts, tracks, fps=DEFAULT_FPS, fade=DEFAULT_FADE, size=(1920, 1080)):
+    """
+    Write an MLT project cutting every track with the same ``cuts``.
+
+    ``cuts`` are ``(in, out)`` frames from :func:`to_frames`; ``tracks`` is a
+    list of ``(path, kind)`` with kind ``video`` or ``audio``. Audio entries
+    get short fades at each cut so the joins do not click.
+    """
+    output_file = Path(output_file)
+    root = ET.Element("mlt", LC_NUMERIC="C", version="7.19.0", producer="main_bin")
+    fps_num, fps_den = (int(fps), 1) if float(fps).is_integer() else (int(round(fps * 1000)), 1000)
+    aspect = gcd(*size)
+    ET.SubElement(
+        root, "profile", description="automatic",
+        width=str(size[0]), height=str(size[1]), progressive="1",
+        sample_aspect_num="1", sample_aspect_den="1",
+        display_aspect_num=str(size[0] // aspect), display_aspect_den=str(size[1] // aspect),
+        frame_rate_num=str(fps_num), frame_rate_den=str(fps_den), colorspace="709",
+    )
+
+    total = sum(last - first + 1 for first, last in cuts)
+    chains = []
+    for index, (path, kind) in enumerate(tracks):
+        duration = media_duration(path)
+        chain = ET.SubElement(root, "chain", id=f"chain{index}", out=clock(duration))
+        _property(chain, "length", clock(duration))
+        _property(chain, "eof", "pause")
+        _property(chain, "resource", os.path.relpath(path, start=output_file.parent))
+        _property(chain, "mlt_service", "avformat-novalidate")
+        _property(chain, "shotcut:caption", Path(path).name)
+        chains.append(chain)
+
+    main_bin = ET.SubElement(root, "playlist", id="main_bin")
+    _property(main_bin, "xml_retain", 1)
+    for chain in chains:
+        ET.SubElement(main_bin, "entry", producer=chain.get("id"), out=chain.get("out"), **{"in": "0"})
+
+    black = ET.SubElement(root, "producer", id="black", out=str(max(total - 1, 0)), **{"in": "0"})
+    _property(black, "length", total)
+    _property(black, "eof", "pause")
+    _property(black, "resource", 0)
+    _property(black, "mlt_service", "color")
+    _property(black, "set.test_audio", 0)
+    background = ET.SubElement(root, "playlist", id="background")
+    ET.SubElement(background, "entry", producer="black", out=str(max(total - 1, 0)), **{"in": "0"})
+
+    video_count = audio_count = 0
+    playlists = []
+    for index, (chain, (path, kind)) in enumerate(zip(chains, tracks)):
+        playlist = ET.SubElement(root, "playlist", id=f"playlist{index}")
+        if kind == "video":
+            video_count += 1
+            _property(playlist, "shotcut:video", 1)
+            _property(playlist, "shotcut:name", f"V{video_count}")
+        else:
+            audio_count += 1
+            _property(playlist, "shotcut:audio", 1)
+            _property(playlist, "shotcut:name", f"A{audio_count}")
+        for first, last in cuts:
+            entry = ET.SubElement(
+                playlist, "entry", producer=chain.get("id"), out=str(last), **{"in": str(first)}
+            )
+            if kind == "audio":
+                _fade_filters(entry, last - first + 1, fps, fade)
+        playlists.append((playlist, kind))
+
+    tractor = ET.SubElement(root, "tractor", id="tractor0", out=str(max(total - 1, 0)), **{"in": "0"})
+    _property(tractor, "shotcut", 1)
+    _property(tractor, "shotcut:projectAudioChannels", 2)
+    ET.SubElement(tractor, "track", producer="background")
+    for playlist, kind in playlists:
+        attrs = {"hide": "video"} if kind == "audio" else {}
+        ET.SubElement(tractor, "track", producer=playlist.get("id"), **attrs)
+    for index in range(1, len(playlists) + 1):
+        mix = ET.SubElement(tractor, "transition", id=f"transition{index - 1}")
+        _property(mix, "a_track", 0)
+        _property(mix, "b_track", index)
+        _property(mix, "mlt_service", "mix")
+        _property(mix, "always_active", 1)
+        _property(mix, "sum", 1)
+
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="  ", level=0)
+    tree.write(output_file, encoding="utf-8", xml_declaration=True)
+    return output_file
+
+
+def session_tracks(folder_path: Path):
+    """
+    The mic a session is cut on, its ``(path, kind)`` tracks for
+    :func:`write_roughcut` and their frame rate.
+
+    The mic is ``mic_clean.ogg``, or ``mic.ogg`` if it has not been cleaned.
+    """
+    folder_path = Path(folder_path)
+    mic_file = folder_path / "mic_clean.ogg"
+    if not mic_file.exists():
+        mic_file = session_file(folder_path, "mic.ogg")
+    screen_file = session_file(folder_path, "screen.mkv")
+    system_file = session_file(folder_path, "system.ogg")
+
+    tracks = [(path, kind) for path, kind in (
+        (screen_file, "video"), (mic_file, "audio"), (system_file, "audio"),
+    ) if path.exists()]
+    fps = probe_fps(screen_file) if screen_file.exists() else DEFAULT_FPS
+    return mic_file, tracks, fps
+
+
+def session_size(folder_path: Path) -> tuple:
+    """
+    ``(width, height)`` of a session's screen video, the MLT profile default
+    without one.
+    """
+    # mlt_generator imports this module
+    from .mlt_generator import session_profile
+
+    screen_file = session_file(Path(folder_path), "screen.mkv")
+    profile = session_profile(screen_file if screen_file.exists() else None)
+    return profile["width"], profile["height"]
+
+
+def rough_cut(
+    folder_path: Path,
+    output_file: Path = None,
+    noise_floor=DEFAULT_NOISE_FLOOR,
+    min_silence=DEFAULT_MIN_SILENCE,
+    padding=DEFAULT_PADDING,
+    fade=DEFAULT_FADE,
+) -> Path:
+    """
+    Cut the silences out of a session folder.
+
+    Speech is detected on the mic from :func:`session_tracks` and the cut
+    list applied to the screen, mic and system tracks.
+    """
+    folder_path = Path(folder_path)
+    mic_file, tracks, fps = session_tracks(folder_path)
+    if output_file is None:
+        output_file = folder_path / "roughcut.mlt"
+
+    duration = media_duration(mic_file)
+    segments = detect_speech(mic_file, noise_floor=noise_floor, min_silence=min_silence)
+    cuts = to_frames(pad_segments(segments, padding, duration), fps)
+    print(f"Rough cut: {len(cuts)} segments kept from {mic_file.name}")
+    return write_roughcut(output_file, cuts, tracks, fps=fps, fade=fade, size=session_size(folder_path))
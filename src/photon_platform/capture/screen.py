@@ -0,0 +1,101 @@
+"""
+What part of the screen to record, and how often.
+
+:class:`ScreenOptions` selects a region (or a whole monitor, by name from
+``xrandr``), a single window by X id, the frame rate and whether
+``ximagesrc`` should only copy damaged areas. A smaller region and a lower
+rate for slide-style sessions cut grab, convert and encode work roughly in
+proportion.
+"""
+from dataclasses import dataclass
+import re
+import subprocess
+
+DEFAULT_REGION = (0, 768, 1920, 1080)  # x, y, width, height
+DEFAULT_FPS = 25
+PROXY_HEIGHT = 480
+
+_MONITOR = re.compile(r"^\s*(\d+):\s+\S+\s+(\d+)/\d+x(\d+)/\d+([+-]\d+)([+-]\d+)\s+(\S+)\s*$")
+
+
+@dataclass(frozen=True)
+class ScreenOptions:
+    region: tuple = DEFAULT_REGION
+    window_id: int = None  # records this window instead of the region
+    fps: int = DEFAULT_FPS
+    use_damage: bool = False
+
+    @property
+    def size(self):
+        """
+        ``(width, height)`` of the recording, or None for a window, whose
+        size is only known once it is captured.
+        """
+        if self.window_id is not None:
+            return None
+        return self.region[2], self.region[3]
+
+
+DEFAULT_SCREEN = ScreenOptions()
+
+
+def parse_region(value: str) -> tuple:
+    """
+    ``X,Y,WIDTH,HEIGHT`` (or ``WIDTHxHEIGHT+X+Y``) to a region tuple, with
+    the size rounded down to even numbers for the encoders.
+    """
+    match = re.fullmatch(r"(\d+)x(\d+)\+(\d+)\+(\d+)", value.strip())
+    if match:
+        width, height, x, y = map(int, match.groups())
+    else:
+        try:
+            x, y, width, height = (int(part) for part in value.split(","))
+        except ValueError:
+            raise ValueError(f"region '{value}' is not X,Y,WIDTH,HEIGHT or WIDTHxHEIGHT+X+Y") from None
+    width, height = width - width % 2, height - height % 2
+    if width <= 0 or height <= 0:
+        raise ValueError(f"region '{value}' is empty")
+    return x, y, width, height
+
+
+def monitor_regions() -> dict:
+    """
+    Region of every connected monitor by name and by index, from
+    ``xrandr --listmonitors``.
+    """
+    try:
+        result = subprocess.run(
+            ["xrandr", "--listmonitors"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise ValueError(f"could not list monitors with xrandr: {e}") from None
+    regions = {}
+    for line in result.stdout.splitlines():
+        match = _MONITOR.match(line)
+        if match:
+            index, width, height, x, y, name = match.groups()
+            region = (int(x), int(y), int(width), int(height))
+            regions[index] = regions[name] = region
+    return regions
+
+
+def monitor_region(name: str) -> tuple:
+    """
+    The region of monitor ``name`` (an output name such as ``DP-1``, or its
+    index), listing the monitors when it is unknown.
+    """
+    regions = monitor_regions()
+    try:
+        return parse_region(",".join(map(str, regions[name])))
+    except KeyError:
+        names = sorted(key for key in regions if not key.isdigit())
+        raise ValueError(f"unknown monitor '{name}', choose from {', '.join(names)}") from None
+
+
+def proxy_size(screen: ScreenOptions, height=PROXY_HEIGHT) -> tuple:
+    """
+    Proxy frame size with the aspect of the recording, 16:9 for a window.
+    """
+    width, full_height = screen.size or (16, 9)
+    proxy_width = round(height * width / full_height)
+    return proxy_width - proxy_width % 2, height
@@ -0,0 +1,134 @@
+"""
+Segmented recording: rolling files plus an ffconcat manifest.
+
+In segmented mode each stream is written by ``splitmuxsink`` as a series of
+self-contained files under ``segments/``, closed every few minutes or
+megabytes, so a killed process or a suspended machine loses at most the
+segment being written. Next to them, ``<stream>.ffconcat`` lists the closed
+segments in order. It stands in for the single file everywhere downstream:
+ffmpeg reads it with ``-f concat -safe 0`` and ffprobe and melt open it
+directly.
+"""
+import os
+from pathlib import Path
+
+SEGMENT_DIR = "segments"
+MANIFEST_SUFFIX = ".ffconcat"
+
+
+def segment_pattern(output_file: Path) -> Path:
+    """
+    ``splitmuxsink`` location for the segments of ``output_file``.
+    """
+    output_file = Path(output_file)
+    return output_file.parent / SEGMENT_DIR / f"{output_file.stem}_%05d{output_file.suffix}"
+
+
+def manifest_path(output_file: Path) -> Path:
+    """
+    The concat manifest standing in for ``output_file``.
+    """
+    return Path(output_file).with_suffix(MANIFEST_SUFFIX)
+
+
+def is_manifest(file_path: Path) -> bool:
+    return Path(file_path).suffix == MANIFEST_SUFFIX
+
+
+def session_file(folder: Path, name: str) -> Path:
+    """
+    ``folder/name``, or its manifest when the stream was recorded segmented.
+    """
+    path = Path(folder) / name
+    if not path.exists() and manifest_path(path).exists():
+        return manifest_path(path)
+    return path
+
+
+def recorded_segments(output_file: Path) -> list:
+    """
+    The non-empty segment files of ``output_file`` on disk, in order.
+    """
+    output_file = Path(output_file)
+    folder = output_file.parent / SEGMENT_DIR
+    return sorted(
+        path for path in folder.glob(f"{output_file.stem}_*{output_file.suffix}")
+        if path.stat().st_size > 0
+    )
+
+
+def write_manifest(output_file: Path, segments) -> Path:
+    """
+    Write the ffconcat manifest of ``output_file`` listing ``segments``.
+    """
+    manifest = manifest_path(output_file)
+    lines = ["ffconcat version 1.0"]
+    for segment in segments:
+        lines.append(f"file '{os.path.relpath(segment, start=manifest.parent)}'")
+    # write-then-rename so a reader never sees a partial list
+    tmp = manifest.with_name(manifest.name + ".tmp")
+    tmp.write_text("\n".join(lines) + "\n")
+    os.replace(tmp, manifest)
+    return manifest
+
+
+def source_files(file_path: Path) -> list:
+    """
+    The files a logical stream is read from: the segments of a manifest,
+    otherwise the file itself.
+    """
+    file_path = Path(file_path)
+    if not is_manifest(file_path):
+        return [file_path]
+    files = []
+    for line in file_path.read_text().splitlines():
+        if line.startswith("file "):
+            files.append(file_path.parent / line[5:].strip().strip("'"))
+    return files
+
+
+def ffmpeg_input(file_path: Path) -> list:
+    """
+    ffmpeg arguments reading ``file_path``, through the concat demuxer when
+    it is a manifest.
+    """
+    if is_manifest(file_path):
+        return ["-f", "concat", "-safe", "0", "-i", str(file_path)]
+    return ["-i", str(file_path)]
+
+
+class SegmentManifests:
+    """
+    Keep the manifests of a segmented recording current while it runs.
+
+    Each ``splitmuxsink-fragment-closed`` message appends the closed segment
+    to its stream's manifest, so finished segments are listed, and can be
+    processed, before the capture stops. The handler rides on the bus signal
+    watch added by :class:`shutdown.ShutdownCoordinator`.
+    """
+
+    def __init__(self, output_files):
+        # splitmuxsink elements are named <stem>_split, see capture.file_sink
+        self.files = {f"{Path(path).stem}_split": Path(path) for path in output_files}
+        self.segments = {name: [] for name in self.files}
+
+    def watch(self, pipeline):
+        pipeline.get_bus().connect("message", self._on_message)
+
+    def _on_message(self, bus, message):
+        structure = message.get_structure()
+        if structure is None or structure.get_name() != "splitmuxsink-fragment-closed":
+            return True
+        name = message.src.get_name() if message.src else None
+        if name in self.files:
+            self.segments[name].append(Path(structure.get_string("location")))
+            write_manifest(self.files[name], self.segments[name])
+        return True
+
+    def finalize(self) -> list:
+        """
+        Rewrite every manifest from the segments on disk once the pipeline
+        has stopped, picking up the last segment and any that closed during
+        shutdown. Returns the manifests.
+        """
+        return [write_manifest(path, recorded_segments(path)) for path in self.files.values()]
@@ -0,0 +1,130 @@
+"""
+Bus-driven start and stop for capture pipelines.
+
+Instead of sleeping for a fixed time after EOS, the coordinator waits on each
+pipeline's bus until the EOS message arrives, so the muxers get to write their
+index no matter how far the encoders have fallen behind.
+"""
+import time
+
+from . import gst
+
+DEFAULT_EOS_TIMEOUT = 30.0
+
+
+class ShutdownCoordinator:
+    """
+    Watch a set of pipelines while recording and shut them down cleanly.
+
+    ERROR messages posted while recording are collected in ``errors`` and quit
+    the main loop so the recording stops instead of hanging silently. Errors
+    from the ``optional`` elements, named branches the recording can do
+    without, are only reported and collected in ``optional_errors``.
+    """
+
+    def __init__(self, pipelines, loop=None, optional=()):
+        self.pipelines = list(pipelines)
+        self.loop = loop
+        self.optional = set(optional)
+        self.errors = []
+        self.optional_errors = []
+        self.finished = set()
+
+    def watch(self):
+        """
+        Start listening to the pipeline buses from the GLib main loop.
+        """
+        for pipeline in self.pipelines:
+            bus = pipeline.get_bus()
+            bus.add_signal_watch()
+            bus.connect("message", self._on_message, pipeline)
+
+    def _on_message(self, bus, message, pipeline):
+        if message.type == gst.Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            source = message.src.get_name() if message.src else "pipeline"
+            if source in self.optional:
+                print(f"\nWARNING: {source} failed, recording goes on without it: {err.message}")
+                self.optional_errors.append((source, err.message))
+            else:
+                self.abort(source, err.message, debug)
+        elif message.type == gst.Gst.MessageType.WARNING:
+            warn, _ = message.parse_warning()
+            source = message.src.get_name() if message.src else "pipeline"
+            print(f"\nWARNING from {source}: {warn.message}")
+        elif message.type == gst.Gst.MessageType.EOS:
+            # a source ran dry on its own (e.g. test sources with num-buffers)
+            self.finished.add(pipeline.get_name())
+            if self.loop is not None:
+                self.loop.quit()
+        return True
+
+    def abort(self, source, reason, detail=None):
+        """
+        Record an error and quit the main loop so :meth:`stop` finalizes the
+        files. Also used from outside the pipelines, e.g. when a device is
+        unplugged.
+        """
+        print(f"\nERROR from {source}: {reason}")
+        if detail:
+            print(f"  {detail}")
+        self.errors.append((source, reason))
+        if self.loop is not None:
+            self.loop.quit()
+
+    def stop(self, timeout=DEFAULT_EOS_TIMEOUT, poll_interval=0.5):
+        """
+        Send EOS to every pipeline and wait until each one reports it.
+
+        Progress is printed while waiting. Pipelines still running after
+        ``timeout`` seconds are forced to NULL and reported, since their
+        files are likely missing an index.
+
+        Returns True when every pipeline finished with EOS.
+        """
+        pending = {}
+        for pipeline in self.pipelines:
+            bus = pipeline.get_bus()
+            bus.remove_signal_watch()
+            if pipeline.get_name() in self.finished:
+                continue
+            pipeline.send_event(gst.Gst.Event.new_eos())
+            pending[pipeline.get_name()] = pipeline
+
+        start = time.monotonic()
+        total = len(self.pipelines)
+        while pending:
+            elapsed = time.monotonic() - start
+            if elapsed >= timeout:
+                break
+            print(
+                f"\rFinalizing files: {total - len(pending)}/{total} done "
+                f"({elapsed:.1f}s)",
+                end="",
+            )
+            for name, pipeline in list(pending.items()):
+                message = pipeline.get_bus().timed_pop_filtered(
+                    int(poll_interval * gst.Gst.SECOND / len(pending)),
+                    gst.Gst.MessageType.EOS | gst.Gst.MessageType.ERROR,
+                )
+                if message is None:
+                    continue
+                if message.type == gst.Gst.MessageType.ERROR:
+                    err, _ = message.parse_error()
+                    source = message.src.get_name() if message.src else name
+                    if source in self.optional:
+                        self.optional_errors.append((source, err.message))
+                        continue
+                    print(f"\nERROR while finalizing {name}: {err.message}")
+                    self.errors.append((name, err.message))
+                del pending[name]
+
+        elapsed = time.monotonic() - start
+        print(f"\rFinalizing files: {total - len(pending)}/{total} done ({elapsed:.1f}s)")
+        for name in pending:
+            print(f"WARNING: {name} did not reach EOS within {timeout}s; file may be truncated.")
+
+        for pipeline in self.pipelines:
+            pipeline.set_state(gst.Gst.State.NULL)
+
+        return not pending
@@ -0,0 +1,86 @@
+"""
+Silence detection on a loudness envelope.
+
+The audio is decoded to mono PCM once into a windowed RMS envelope in dBFS
+(see :mod:`.envelope`), and speech segments can then be found for any noise
+floor and minimum silence without decoding again.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from .envelope import DEFAULT_FRAME, load_envelope
+
+DEFAULT_NOISE_FLOOR = -30.0  # dBFS
+DEFAULT_MIN_SILENCE = 2.0  # seconds
+
+
+def _runs(mask: np.ndarray):
+    """
+    Start and end indices (end exclusive) of the True runs in ``mask``.
+    """
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_segments(
+    envelope: np.ndarray,
+    frame=DEFAULT_FRAME,
+    noise_floor=DEFAULT_NOISE_FLOOR,
+    min_silence=DEFAULT_MIN_SILENCE,
+    min_speech=0.0,
+) -> list:
+    """
+    ``(start, end)`` seconds of the parts of ``envelope`` that are not silent.
+
+    A silence is a run of frames below ``noise_floor`` lasting at least
+    ``min_silence`` seconds; shorter dips stay inside the surrounding speech.
+    Speech segments shorter than ``min_speech`` are dropped. Every segment is
+    closed, the last one ending at the end of the envelope.
+    """
+    silent = envelope < noise_floor
+    starts, ends = _runs(silent)
+    keep = (ends - starts) * frame >= min_silence
+    delta = np.zeros(len(envelope) + 1, dtype=np.int8)
+    delta[starts[keep]] = 1
+    delta[ends[keep]] = -1
+    silent = np.cumsum(delta[:-1]) > 0
+
+    starts, ends = _runs(~silent)
+    keep = (ends - starts) * frame >= min_speech
+    return [
+        (round(float(start * frame), 6), round(float(end * frame), 6))
+        for start, end in zip(starts[keep], ends[keep])
+    ]
+
+
+def silence_segments(envelope: np.ndarray, frame=DEFAULT_FRAME, **kwargs) -> list:
+    """
+    ``(start, end)`` seconds of the gaps between :func:`speech_segments`.
+    """
+    duration = round(len(envelope) * frame, 6)
+    gaps = []
+    last = 0.0
+    for start, end in speech_segments(envelope, frame, **kwargs):
+        if start > last:
+            gaps.append((last, start))
+        last = end
+    if last < duration:
+        gaps.append((last, duration))
+    return gaps
+
+
+def detect_speech(
+    file_path: Path,
+    noise_floor=DEFAULT_NOISE_FLOOR,
+    min_silence=DEFAULT_MIN_SILENCE,
+    min_speech=0.0,
+    frame=DEFAULT_FRAME,
+) -> list:
+    """
+    Speech segments of ``file_path``, read from its envelope sidecar.
+
+    The sidecar is built on first use and whenever the file changes.
+    """
+    envelope = load_envelope(file_path, frame)
+    return speech_segments(envelope, frame, noise_floor, min_silence, min_speech)
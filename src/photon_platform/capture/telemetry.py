@@ -0,0 +1,242 @@
+"""
+Live levels and encoder health while recording.
+
+:class:`Telemetry` listens to the ``level`` elements on the audio branches,
+QoS messages from anywhere in the pipeline and a buffer probe in front of the
+screen encoder. Once a second it samples peak and RMS dBFS, clip counts,
+encoder queue depth and actual against target fps, prints or hands them to
+the dashboard, and keeps a per-session ``metrics.json`` so bad takes and
+overloaded encoders show up while there is still time to redo them.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from . import gst
+
+METRICS_NAME = "metrics.json"
+CLIP_DB = -0.1  # peaks at or above this count as clipped
+SILENT_DB = -120.0
+DEFAULT_INTERVAL = 1.0
+WRITE_EVERY = 10  # samples between metrics.json rewrites
+
+# element names given by capture.configure_session_pipeline
+LEVELS = {"mic_level": "mic", "system_level": "system"}
+SCREEN_QUEUE = "screen_queue"
+
+
+def _db(values):
+    # level reports one value per channel; keep the loudest
+    return max((v for v in values if v == v), default=SILENT_DB)
+
+
+class Telemetry:
+    """
+    Collect capture metrics from ``pipeline`` into ``metrics_file``.
+
+    :meth:`watch` needs a signal watch on the pipeline bus, as added by
+    :meth:`shutdown.ShutdownCoordinator.watch`, and samples on the GLib main
+    loop.
+    """
+
+    def __init__(self, pipeline, metrics_file: Path, interval=DEFAULT_INTERVAL):
+        self.pipeline = pipeline
+        self.metrics_file = Path(metrics_file)
+        self.interval = interval
+        self.started = None
+        self.audio = {
+            name: {"peak_db": SILENT_DB, "rms_db": SILENT_DB, "max_peak_db": SILENT_DB, "clips": 0}
+            for name in LEVELS.values()
+        }
+        self.video = {
+            "frames": 0, "fps": 0.0, "target_fps": None, "min_fps": None,
+            "queue_depth": 0, "queue_max": 0, "max_queue_depth": 0, "dropped": 0,
+        }
+        self.samples = []
+        self._running = False
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._last = None
+        self._queue = pipeline.get_by_name(SCREEN_QUEUE)
+        self._dropped = {}  # QoS drop totals, per element
+
+    def watch(self):
+        """
+        Start listening to the bus and counting screen buffers.
+        """
+        self.started = time.monotonic()
+        self._last = (self.started, 0)
+        self._running = True
+        self.pipeline.get_bus().connect("message", self._on_message)
+        if self._queue is not None:
+            self.video["queue_max"] = self._queue.get_property("max-size-buffers")
+            pad = self._queue.get_static_pad("src")
+            pad.add_probe(gst.Gst.PadProbeType.BUFFER, self._on_buffer)
+        gst.GLib.timeout_add(int(self.interval * 1000), self._tick)
+
+    def _on_buffer(self, pad, info):
+        # streaming thread
+        with self._lock:
+            self._frames += 1
+        if self.video["target_fps"] is None:
+            caps = pad.get_current_caps()
+            if caps is not None:
+                ok, num, den = caps.get_structure(0).get_fraction("framerate")
+                if ok and den:
+                    self.video["target_fps"] = num / den
+        return gst.Gst.PadProbeReturn.OK
+
+    def _on_message(self, bus, message):
+        if message.type == gst.Gst.MessageType.ELEMENT:
+            structure = message.get_structure()
+            source = message.src.get_name() if message.src else None
+            if structure is not None and structure.get_name() == "level" and source in LEVELS:
+                stats = self.audio[LEVELS[source]]
+                peak = _db(structure.get_value("peak"))
+                stats["peak_db"] = max(stats["peak_db"], peak)
+                stats["rms_db"] = _db(structure.get_value("rms"))
+                stats["max_peak_db"] = max(stats["max_peak_db"], peak)
+                if peak >= CLIP_DB:
+                    stats["clips"] += 1
+        elif message.type == gst.Gst.MessageType.QOS:
+            # a running total per element, not the drops since the last message
+            _, _, dropped = message.parse_qos_stats()
+            source = message.src.get_name() if message.src else None
+            self._dropped[source] = max(dropped, 0)
+            self.video["dropped"] = sum(self._dropped.values())
+        return True
+
+    def sample(self) -> dict:
+        """
+        Take a sample: fps since the last one, queue depth, and the audio
+        peaks held since the last one.
+        """
+        now = time.monotonic()
+        with self._lock:
+            frames = self._frames
+        last_time, last_frames = self._last
+        self._last = (now, frames)
+        video = self.video
+        video["frames"] = frames
+        if now > last_time:
+            video["fps"] = (frames - last_frames) / (now - last_time)
+            if frames:
+                # a stall at 0 fps has to stick
+                if video["min_fps"] is None:
+                    video["min_fps"] = video["fps"]
+                else:
+                    video["min_fps"] = min(video["min_fps"], video["fps"])
+        if self._queue is not None:
+            video["queue_depth"] = self._queue.get_property("current-level-buffers")
+            video["max_queue_depth"] = max(video["max_queue_depth"], video["queue_depth"])
+
+        sample = {
+            "elapsed": round(now - self.started, 3),
+            "audio": {
+                name: {"peak_db": round(s["peak_db"], 1), "rms_db": round(s["rms_db"], 1), "clips": s["clips"]}
+                for name, s in self.audio.items()
+            },
+            "video": {
+                "fps": round(video["fps"], 2),
+                "queue_depth": video["queue_depth"],
+                "dropped": video["dropped"],
+            },
+        }
+        for stats in self.audio.values():
+            stats["peak_db"] = SILENT_DB
+        self.samples.append(sample)
+        return sample
+
+    def _tick(self):
+        if not self._running:
+            return False
+        self.sample()
+        if len(self.samples) % WRITE_EVERY == 0:
+            self.write()
+        return True
+
+    def warnings(self) -> list:
+        """
+        Problems worth stopping for: clipping, dropped frames, a slow encoder.
+        """
+        found = []
+        for name, stats in self.audio.items():
+            if stats["clips"]:
+                found.append(f"{name} clipped {stats['clips']} times")
+        video = self.video
+        if video["dropped"]:
+            found.append(f"{video['dropped']} screen buffers dropped")
+        target = video["target_fps"]
+        if target and self.samples and video["fps"] < 0.9 * target:
+            found.append(f"screen at {video['fps']:.1f} of {target:g} fps")
+        if video["queue_max"] and video["queue_depth"] >= 0.8 * video["queue_max"]:
+            found.append("encoder queue nearly full")
+        return found
+
+    def status_line(self) -> str:
+        """
+        One-line summary for the console.
+        """
+        elapsed = time.strftime("%H:%M:%S", time.gmtime(time.monotonic() - self.started))
+        sample = self.samples[-1] if self.samples else None
+        if sample is None:
+            return f"Elapsed Time: {elapsed}"
+        audio = "  ".join(
+            f"{name} {s['peak_db']:6.1f} dB" + (f" ({s['clips']} clips)" if s["clips"] else "")
+            for name, s in sample["audio"].items()
+        )
+        video = sample["video"]
+        return (
+            f"Elapsed Time: {elapsed}  {audio}  "
+            f"screen {video['fps']:4.1f} fps  queue {video['queue_depth']}  dropped {video['dropped']}"
+        )
+
+    def summary(self) -> dict:
+        return {
+            "audio": {
+                name: {"max_peak_db": round(s["max_peak_db"], 1), "clips": s["clips"]}
+                for name, s in self.audio.items()
+            },
+            "video": {
+                key: self.video[key]
+                for key in ("frames", "target_fps", "min_fps", "max_queue_depth", "queue_max", "dropped")
+            },
+            "warnings": self.warnings(),
+        }
+
+    def write(self) -> Path:
+        """
+        Write the summary and all samples so far to ``metrics_file``.
+        """
+        metrics = {
+            "written": datetime.datetime.now().isoformat(timespec="seconds"),
+            "interval": self.interval,
+            "summary": self.summary(),
+            "samples": self.samples,
+        }
+        tmp = self.metrics_file.with_name(self.metrics_file.name + ".tmp")
+        tmp.write_text(json.dumps(metrics, indent=2))
+        os.replace(tmp, self.metrics_file)
+        return self.metrics_file
+
+    def finish(self) -> Path:
+        """
+        Stop sampling and write the final metrics.
+        """
+        self._running = False
+        self.sample()
+        return self.write()
+
+
+def print_status(telemetry: Telemetry, stop_event):
+    """
+    Console meter: rewrite :meth:`Telemetry.status_line` every second until
+    ``stop_event`` is set. Replaces :func:`capture.display_elapsed_time`.
+    """
+    while not stop_event.is_set():
+        print(f"\r{telemetry.status_line()}", end="")
+        stop_event.wait(1)
+    print()
@@ -0,0 +1,282 @@
+"""
+Offline speech-to-text for a session's clean mic.
+
+Only the speech found by silence detection is transcribed: the speech
+segments are padded, long ones are split at their quietest point, and each
+piece is recognized with a local Vosk model on a process pool, one model per
+worker. Results are cached per piece under
+``~/.cache/photon-capture/transcripts``, keyed by the hash of its samples
+and a fingerprint of the model, so a re-run after changing the silence
+settings only transcribes the pieces that changed.
+
+Next to the audio this writes ``<stem>.srt`` and ``<stem>.vtt`` subtitles
+and ``<stem>.words.json`` with per-word timings. Vosk is optional: install
+it with ``pip install vosk`` and point ``CAPTURE_VOSK_MODEL`` (or
+``model=``) at an unpacked model folder.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from itertools import repeat
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .cache import CACHE_DIR
+from .envelope import DEFAULT_FRAME, decode_pcm, load_envelope
+from .probe import media_hash
+from .roughcut import pad_segments
+from .silence import DEFAULT_MIN_SILENCE, DEFAULT_NOISE_FLOOR, speech_segments
+
+DEFAULT_MODEL = os.environ.get("CAPTURE_VOSK_MODEL")
+RATE = 16000  # what the Vosk models are trained on
+DEFAULT_PADDING = 0.2  # seconds around speech, so first and last words are whole
+MAX_PIECE = 30.0  # seconds; longer speech is split to spread it over the workers
+TRANSCRIPT_CACHE = CACHE_DIR.parent / "transcripts"
+
+# subtitle cues break on a pause or when they get too long to read
+CUE_GAP = 0.8
+CUE_SECONDS = 6.0
+LINE_CHARS = 42
+
+_model = None  # the worker's Vosk model
+
+
+def _vosk():
+    try:
+        import vosk
+    except ImportError:
+        raise RuntimeError("transcription needs Vosk: pip install vosk") from None
+    return vosk
+
+
+def model_path(model=None) -> Path:
+    """
+    The Vosk model folder, ``model`` or ``CAPTURE_VOSK_MODEL``.
+    """
+    model = model or DEFAULT_MODEL
+    if not model:
+        raise ValueError("no Vosk model: set CAPTURE_VOSK_MODEL or pass a model folder")
+    path = Path(model).expanduser()
+    if not path.is_dir():
+        raise ValueError(f"Vosk model folder {path} does not exist")
+    return path
+
+
+def transcript_paths(audio_file: Path) -> dict:
+    """
+    The ``srt``, ``vtt`` and ``words`` files written for ``audio_file``.
+    """
+    audio_file = Path(audio_file)
+    return {
+        "srt": audio_file.with_suffix(".srt"),
+        "vtt": audio_file.with_suffix(".vtt"),
+        "words": audio_file.with_suffix(".words.json"),
+    }
+
+
+def split_long(segments, envelope: np.ndarray, frame=DEFAULT_FRAME, max_length=MAX_PIECE) -> list:
+    """
+    Split segments longer than ``max_length`` at the quietest envelope frame
+    in the second half of each ``max_length`` window, between words.
+    """
+    pieces = []
+    for start, end in segments:
+        while end - start > max_length:
+            low, high = int((start + max_length / 2) / frame), int((start + max_length) / frame)
+            cut = (low + int(np.argmin(envelope[low:high]))) * frame
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+    return pieces
+
+
+def model_fingerprint(model: Path) -> str:
+    """
+    Identity of a Vosk model folder: its resolved path, the contents of its
+    ``conf/`` files and README, which names the version, and the size and
+    modification time of the acoustic model files, too large to hash.
+    """
+    model = Path(model).resolve()
+    digest = hashlib.sha256(str(model).encode())
+    for path in sorted(model.glob("conf/*")) + [model / "README"]:
+        if path.is_file():
+            digest.update(f"{path.name}:".encode())
+            digest.update(path.read_bytes())
+    for path in sorted(model.glob("am/*")):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def piece_key(pcm: bytes, model: str) -> str:
+    """
+    Cache key of a piece: its samples and the :func:`model_fingerprint` of
+    the model that recognizes them.
+    """
+    digest = hashlib.sha256(f"{model}:{RATE}:".encode())
+    digest.update(pcm)
+    return digest.hexdigest()
+
+
+def _read_cached(key: str):
+    try:
+        return json.loads((TRANSCRIPT_CACHE / f"{key}.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(key: str, words: list):
+    TRANSCRIPT_CACHE.mkdir(parents=True, exist_ok=True)
+    tmp = TRANSCRIPT_CACHE / f"{key}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(words))
+    os.replace(tmp, TRANSCRIPT_CACHE / f"{key}.json")
+
+
+def _init_worker(model: Path):
+    global _model
+    vosk = _vosk()
+    vosk.SetLogLevel(-1)
+    _model = vosk.Model(str(model))
+
+
+def _recognize(pcm: bytes, rate=RATE) -> list:
+    """
+    Words of one piece of 16-bit mono PCM, timed from its start.
+    """
+    recognizer = _vosk().KaldiRecognizer(_model, rate)
+    recognizer.SetWords(True)
+    words = []
+    chunk = rate * 2 * 4  # four seconds of samples
+    for offset in range(0, len(pcm), chunk):
+        if recognizer.AcceptWaveform(pcm[offset:offset + chunk]):
+            words += json.loads(recognizer.Result()).get("result", [])
+    words += json.loads(recognizer.FinalResult()).get("result", [])
+    return [
+        {"word": w["word"], "start": w["start"], "end": w["end"], "conf": w.get("conf", 1.0)}
+        for w in words
+    ]
+
+
+def _timestamp(seconds: float, separator=",") -> str:
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}{separator}{ms % 1000:03d}"
+
+
+def _wrap(text: str) -> str:
+    if len(text) <= LINE_CHARS:
+        return text
+    words = text.split()
+    # break at the word boundary closest to the middle
+    lengths = np.cumsum([len(word) + 1 for word in words])
+    split = int(np.argmin(np.abs(lengths - len(text) / 2))) + 1
+    return " ".join(words[:split]) + "\n" + " ".join(words[split:])
+
+
+def subtitle_cues(segments) -> list:
+    """
+    ``(start, end, text)`` cues from transcript segments, broken on pauses
+    and kept to two lines and a few seconds each.
+    """
+    cues = []
+    for segment in segments:
+        current = []
+        for word in segment["words"]:
+            if current and (
+                word["start"] - current[-1]["end"] > CUE_GAP
+                or word["end"] - current[0]["start"] > CUE_SECONDS
+                or sum(len(w["word"]) + 1 for w in current) + len(word["word"]) > 2 * LINE_CHARS
+            ):
+                cues.append(current)
+                current = []
+            current.append(word)
+        if current:
+            cues.append(current)
+    return [
+        (cue[0]["start"], cue[-1]["end"], _wrap(" ".join(w["word"] for w in cue)))
+        for cue in cues
+    ]
+
+
+def to_srt(cues) -> str:
+    return "".join(
+        f"{index}\n{_timestamp(start)} --> {_timestamp(end)}\n{text}\n\n"
+        for index, (start, end, text) in enumerate(cues, 1)
+    )
+
+
+def to_vtt(cues) -> str:
+    return "WEBVTT\n\n" + "".join(
+        f"{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n{text}\n\n"
+        for start, end, text in cues
+    )
+
+
+def transcribe(
+    audio_file: Path,
+    model=None,
+    padding=DEFAULT_PADDING,
+    noise_floor=DEFAULT_NOISE_FLOOR,
+    min_silence=DEFAULT_MIN_SILENCE,
+    workers=None,
+) -> Path:
+    """
+    Transcribe the speech in ``audio_file`` and write the subtitles and word
+    timings next to it. Returns the words file.
+    """
+    audio_file = Path(audio_file)
+    model = model_path(model)
+    _vosk()  # fail before decoding when it is missing
+
+    envelope = load_envelope(audio_file)
+    samples = decode_pcm(audio_file, RATE)
+    duration = len(samples) / RATE
+    segments = speech_segments(envelope, DEFAULT_FRAME, noise_floor, min_silence)
+    pieces = split_long(pad_segments(segments, padding, duration), envelope)
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    chunks = [pcm[int(start * RATE):int(end * RATE)].tobytes() for start, end in pieces]
+    fingerprint = model_fingerprint(model)
+    keys = [piece_key(chunk, fingerprint) for chunk in chunks]
+    results = {key: _read_cached(key) for key in keys}
+    pending = [index for index, key in enumerate(keys) if results[key] is None]
+    print(
+        f"Transcribe: {len(pieces)} speech pieces of {audio_file.name}, "
+        f"{len(pieces) - len(pending)} cached"
+    )
+    if pending:
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model,)) as pool:
+            recognized = pool.map(_recognize, [chunks[index] for index in pending], repeat(RATE))
+            for index, words in zip(pending, recognized):
+                _write_cached(keys[index], words)
+                results[keys[index]] = words
+
+    transcript = []
+    for (start, end), key in zip(pieces, keys):
+        words = [
+            {**word, "start": round(start + word["start"], 6), "end": round(start + word["end"], 6)}
+            for word in results[key]
+        ]
+        if words:
+            transcript.append({
+                "start": start,
+                "end": end,
+                "text": " ".join(word["word"] for word in words),
+                "words": words,
+            })
+
+    paths = transcript_paths(audio_file)
+    cues = subtitle_cues(transcript)
+    paths["srt"].write_text(to_srt(cues))
+    paths["vtt"].write_text(to_vtt(cues))
+    paths["words"].write_text(json.dumps({
+        "source": audio_file.name,
+        "md5": media_hash(audio_file),
+        "rate": RATE,
+        "model": model.name,
+        "segments": transcript,
+    }, indent=1))
+    print(f"Transcript: {sum(len(s['words']) for s in transcript)} words in {len(cues)} cues")
+    return paths["words"]
@@ -0,0 +1,300 @@
+"""
+Transcript index for text-based editing.
+
+The word timings from :mod:`.transcribe` are loaded into a SQLite file next
+to the audio, ``<stem>.index.sqlite``. Every word and sentence has a sample
+range ``[start, stop)`` at the transcript's rate. Sentences are runs of
+words without a long pause between them, since the recognizer gives no
+punctuation. Text search goes through an FTS5 table over the sentences.
+Time lookups use indexes on the start samples, bounded by the longest word
+or sentence, so both stay fast on multi-hour archives.
+
+Kept spans become cuts for :func:`roughcut.write_roughcut`, which applies
+them to the screen, mic and system tracks alike. Deleting words from the
+transcript is :meth:`TranscriptIndex.keep_except` followed by
+:func:`text_cut`.
+"""
+from contextlib import closing
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import re
+import sqlite3
+
+from .hashing import file_md5
+from .roughcut import DEFAULT_FADE, pad_segments, session_size, session_tracks, to_frames, write_roughcut
+from .transcribe import transcript_paths
+
+INDEX_SUFFIX = ".index.sqlite"
+SENTENCE_GAP = 0.6  # seconds of pause that end a sentence
+DEFAULT_PADDING = 0.1  # seconds kept around each span; words are timed tightly
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE words (
+    id INTEGER PRIMARY KEY,
+    sentence INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    conf REAL
+);
+CREATE INDEX words_start ON words (start);
+CREATE TABLE sentences (
+    id INTEGER PRIMARY KEY,
+    first INTEGER NOT NULL,
+    last INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX sentences_start ON sentences (start);
+CREATE VIRTUAL TABLE sentences_text USING fts5 (text, content='sentences', content_rowid='id');
+"""
+
+
+@dataclass(frozen=True)
+class Span:
+    first: int  # word ids, inclusive
+    last: int
+    start: int  # samples, stop exclusive
+    stop: int
+    text: str
+
+
+def index_path(audio_file: Path) -> Path:
+    audio_file = Path(audio_file)
+    return audio_file.with_name(audio_file.stem + INDEX_SUFFIX)
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r"\w+", text.lower())
+
+
+def build_index(audio_file: Path) -> Path:
+    """
+    Write the index of the transcript of ``audio_file``.
+
+    It is built in a temporary file and renamed into place, so readers never
+    see a half-written index.
+    """
+    words_file = transcript_paths(audio_file)["words"]
+    transcript = json.loads(words_file.read_text())
+    rate = transcript["rate"]
+
+    words, sentences = [], []  # sentences as [id, first word, start, texts]
+    for segment in transcript["segments"]:
+        previous = None
+        for word in segment["words"]:
+            start, stop = round(word["start"] * rate), round(word["end"] * rate)
+            if previous is None or start - previous > SENTENCE_GAP * rate:
+                sentences.append([len(sentences) + 1, len(words) + 1, start, []])
+            sentences[-1][3].append(word["word"])
+            words.append((len(words) + 1, sentences[-1][0], word["word"], start, stop, word.get("conf")))
+            previous = stop
+    rows = []
+    for number, first, start, text in sentences:
+        last = first + len(text) - 1
+        rows.append((number, first, last, start, words[last - 1][4], " ".join(text)))
+
+    output = index_path(audio_file)
+    tmp = output.with_name(output.name + f".{os.getpid()}.tmp")
+    try:
+        tmp.unlink()  # left over from a killed build
+    except FileNotFoundError:
+        pass
+    with closing(sqlite3.connect(tmp)) as db, db:
+        db.executescript(SCHEMA)
+        db.executemany("INSERT INTO words VALUES (?, ?, ?, ?, ?, ?)", words)
+        db.executemany("INSERT INTO sentences VALUES (?, ?, ?, ?, ?, ?)", rows)
+        db.execute("INSERT INTO sentences_text (sentences_text) VALUES ('rebuild')")
+        meta = {
+            "words_md5": file_md5(words_file),
+            "rate": rate,
+            "max_word": max((stop - start for _, _, _, start, stop, _ in words), default=0),
+            "max_sentence": max((row[4] - row[3] for row in rows), default=0),
+        }
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in meta.items()])
+    os.replace(tmp, output)
+    return output
+
+
+class TranscriptIndex:
+    """
+    Word and sentence lookups on the index of ``audio_file``, built or
+    rebuilt first when the transcript changed.
+    """
+
+    def __init__(self, audio_file: Path):
+        self.audio_file = Path(audio_file)
+        path = index_path(self.audio_file)
+        words_file = transcript_paths(self.audio_file)["words"]
+        if not words_file.exists():
+            raise ValueError(f"{self.audio_file.name} has no transcript; run capt transcribe first")
+        if not path.exists() or self._meta(path).get("words_md5") != file_md5(words_file):
+            build_index(self.audio_file)
+        self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        meta = self._meta(path)
+        self.rate = int(meta["rate"])
+        self._max_word = int(meta["max_word"])
+        self._max_sentence = int(meta["max_sentence"])
+
+    @staticmethod
+    def _meta(path: Path) -> dict:
+        try:
+            with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as db:
+                return dict(db.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error:
+            return {}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def seconds(self, samples: int) -> float:
+        return samples / self.rate
+
+    def span(self, first: int, last: int) -> Span:
+        """
+        The words ``first`` to ``last`` (ids, inclusive) as one span.
+        """
+        rows = self.db.execute(
+            "SELECT word, start, stop FROM words WHERE id BETWEEN ? AND ? ORDER BY id",
+            (first, last),
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"no words between {first} and {last}")
+        return Span(first, last, rows[0][1], rows[-1][2], " ".join(row[0] for row in rows))
+
+    def words(self, start=0.0, end=None) -> list:
+        """
+        One span per word overlapping ``start`` to ``end`` seconds.
+        """
+        rows = self.db.execute(
+            "SELECT id, id, start, stop, word FROM words "
+            "WHERE start >= ? AND start < ? AND stop > ? ORDER BY start",
+            self._bounds(start, end, self._max_word),
+        )
+        return [Span(*row) for row in rows]
+
+    def sentences(self, start=0.0, end=None) -> list:
+        """
+        One span per sentence overlapping ``start`` to ``end`` seconds.
+        """
+        rows = self.db.execute(
+            "SELECT first, last, start, stop, text FROM sentences "
+            "WHERE start >= ? AND start < ? AND stop > ? ORDER BY start",
+            self._bounds(start, end, self._max_sentence),
+        )
+        return [Span(*row) for row in rows]
+
+    def _bounds(self, start, end, longest):
+        low = round(start * self.rate)
+        high = round(end * self.rate) if end is not None else 2**62
+        # rows are sorted by start and none is longer than ``longest``
+        return low - longest, high, low
+
+    def at(self, seconds: float):
+        """
+        The word spoken at ``seconds``, or None in a pause.
+        """
+        found = self.words(seconds, seconds + 1 / self.rate)
+        return found[0] if found else None
+
+    def search(self, text: str, limit=None) -> list:
+        """
+        Every occurrence of the phrase ``text`` within a sentence, in time
+        order, as word-accurate spans. Case and punctuation are ignored.
+        """
+        tokens = _tokens(text)
+        if not tokens:
+            return []
+        phrase = '"' + " ".join(tokens).replace('"', '""') + '"'
+        rows = self.db.execute(
+            "SELECT sentences.first, sentences.last FROM sentences_text "
+            "JOIN sentences ON sentences.id = sentences_text.rowid "
+            "WHERE sentences_text MATCH ? ORDER BY sentences.start",
+            (phrase,),
+        )
+        found = []
+        for first, last in rows:
+            words = self.db.execute(
+                "SELECT word FROM words WHERE id BETWEEN ? AND ? ORDER BY id", (first, last)
+            ).fetchall()
+            # a word can hold several tokens, e.g. "don't"; match on the
+            # flat token list, starting and ending on whole words
+            flat, owner, starts, ends = [], [], set(), set()
+            for offset, (word,) in enumerate(words):
+                word_tokens = _tokens(word)
+                if word_tokens:
+                    starts.add(len(flat))
+                    flat += word_tokens
+                    owner += [first + offset] * len(word_tokens)
+                    ends.add(len(flat))
+            for start in range(len(flat) - len(tokens) + 1):
+                end = start + len(tokens)
+                if start in starts and end in ends and flat[start:end] == tokens:
+                    found.append(self.span(owner[start], owner[end - 1]))
+                    if limit and len(found) >= limit:
+                        return found
+        return found
+
+    def keep_except(self, removed) -> list:
+        """
+        Spans of every sentence with the ``removed`` spans taken out, for
+        cutting by deleting words.
+        """
+        gone = set()
+        for span in removed:
+            gone.update(range(span.first, span.last + 1))
+        kept, run = [], []
+
+        def flush():
+            if run:
+                kept.append(Span(run[0][0], run[-1][0], run[0][3], run[-1][4], " ".join(w[2] for w in run)))
+                run.clear()
+
+        for word in self.db.execute("SELECT id, sentence, word, start, stop FROM words ORDER BY id"):
+            if word[0] in gone or (run and run[-1][1] != word[1]):
+                flush()
+            if word[0] not in gone:
+                run.append(word)
+        flush()
+        return kept
+
+
+def spans_to_cuts(spans, rate: int, fps: float, padding=DEFAULT_PADDING, duration=None) -> list:
+    """
+    ``(in, out)`` frames keeping ``spans`` in time order, each widened by
+    ``padding`` seconds and merged where they meet.
+    """
+    segments = sorted((span.start / rate, span.stop / rate) for span in spans)
+    return to_frames(pad_segments(segments, padding, duration), fps)
+
+
+def text_cut(
+    folder_path: Path,
+    spans,
+    output_file: Path = None,
+    padding=DEFAULT_PADDING,
+    fade=DEFAULT_FADE,
+) -> Path:
+    """
+    Write an MLT project of a session keeping only ``spans`` of its
+    transcript, on the screen, mic and system tracks alike.
+    """
+    folder_path = Path(folder_path)
+    mic_file, tracks, fps = session_tracks(folder_path)
+    if output_file is None:
+        output_file = folder_path / "textcut.mlt"
+    with TranscriptIndex(mic_file) as index:
+        rate = index.rate
+    cuts = spans_to_cuts(spans, rate, fps, padding)
+    print(f"Text cut: {len(cuts)} segments kept from {mic_file.name}")
+    return write_roughcut(output_file, cuts, tracks, fps=fps, fade=fade, size=session_size(folder_path))
@@ -0,0 +1,205 @@
+"""
+Named production workflows defined in YAML.
+
+A workflow says how to record and which post-processing stages to run, with
+options per stage::
+
+    name: presentation
+    description: Slides at a low frame rate, rough-cut and rendered.
+    record:              # long options of capt record, without the dashes
+      fps: 5
+      damage: true
+    stages:              # run in dependency order, whatever order they are listed in
+      - clean
+      - mux
+      - envelope
+      - roughcut:
+          min_silence: 3.0
+      - render
+    open: roughcut       # project to open in Shotcut at the end, if any
+
+The built-in workflows live in the package's ``workflows`` folder; a path to
+any other YAML file works too. With ``--session`` recording is skipped and
+the stages run over existing session folders, so the heavy stages can run on
+a machine other than the one that captured.
+"""
+import argparse
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+
+import yaml
+
+from . import reprocess
+from .mlt_generator import launch_shotcut
+
+WORKFLOW_DIR = Path(__file__).parent / "workflows"
+WORKFLOW_KEYS = {"name", "description", "record", "stages", "open"}
+PROJECTS = ("mlt", "roughcut")
+
+
+@dataclass(frozen=True)
+class Workflow:
+    name: str
+    description: str = ""
+    record: dict = field(default_factory=dict)
+    stages: tuple = ()
+    options: dict = field(default_factory=dict)
+    open: str = None
+
+
+def builtin_workflows() -> dict:
+    """
+    Path of every packaged workflow by name.
+    """
+    return {path.stem: path for path in sorted(WORKFLOW_DIR.glob("*.yaml"))}
+
+
+def _parse_stages(entries) -> tuple:
+    stages, options = [], {}
+    for entry in entries or []:
+        if isinstance(entry, str):
+            stages.append(entry)
+        elif isinstance(entry, dict) and len(entry) == 1:
+            (name, stage_options), = entry.items()
+            stages.append(name)
+            options[name] = stage_options or {}
+        else:
+            raise ValueError(f"stage entries are names or 'name: {{options}}', not {entry!r}")
+    return tuple(stages), options
+
+
+def load_workflow(name_or_path: str) -> Workflow:
+    """
+    Read and check a workflow, by built-in name or from a YAML file.
+
+    Raises ValueError for an unknown workflow, key, stage or stage option.
+    """
+    path = Path(name_or_path)
+    if not path.is_file():
+        path = builtin_workflows().get(name_or_path)
+        if path is None:
+            names = ", ".join(builtin_workflows())
+            raise ValueError(f"no workflow '{name_or_path}'; built-in workflows: {names}")
+    data = yaml.safe_load(path.read_text()) or {}
+    unknown = sorted(set(data) - WORKFLOW_KEYS)
+    if unknown:
+        raise ValueError(f"{path}: unknown keys {', '.join(unknown)}")
+
+    stages, options = _parse_stages(data.get("stages"))
+    unknown = sorted(set(stages) - set(reprocess.STAGE_NAMES))
+    if unknown:
+        raise ValueError(f"{path}: unknown stages {', '.join(unknown)}")
+    try:
+        reprocess.stage_options(options)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+    if data.get("open") not in (None, *PROJECTS):
+        raise ValueError(f"{path}: open must be one of {', '.join(PROJECTS)}")
+    return Workflow(
+        name=data.get("name", path.stem),
+        description=data.get("description", ""),
+        record=dict(data.get("record") or {}),
+        stages=stages,
+        options=options,
+        open=data.get("open"),
+    )
+
+
+def record_argv(record: dict) -> list:
+    """
+    ``capt record`` arguments from a workflow's ``record`` section: true
+    becomes a bare flag, false or null leaves the option out.
+    """
+    argv = []
+    for key, value in record.items():
+        flag = "--" + key.replace("_", "-")
+        if value is True:
+            argv.append(flag)
+        elif value is not False and value is not None:
+            argv += [flag, str(value)]
+    return argv
+
+
+def run_workflow(workflow: Workflow, sessions, jobs=None, force=False) -> list:
+    """
+    Run the workflow's stages over ``sessions`` and open the chosen project
+    when there is a single session. Returns the sessions that failed.
+    """
+    print(f"Workflow {workflow.name}: {', '.join(workflow.stages) or 'no stages'}")
+    failed = reprocess.reprocess_sessions(
+        sessions, jobs, force, workflow.stages, workflow.options
+    )
+    if workflow.open and len(sessions) == 1 and not failed:
+        folder = sessions[0]
+        slug = reprocess.SESSION_PATTERN.match(folder.name).group("slug")
+        project = folder / (f"{slug}.mlt" if workflow.open == "mlt" else f"{slug}_roughcut.mlt")
+        if project.exists():
+            launch_shotcut(project.resolve())
+    return failed
+
+
+def main(argv=None):
+    """
+    ``capt workflow``: record and post-process a session as a workflow, or
+    run a workflow's stages over existing sessions.
+    """
+    parser = argparse.ArgumentParser(
+        prog="capt workflow",
+        description="Record and post-process as a named YAML workflow.",
+        epilog="Options not listed here are passed on to 'capt record'.",
+    )
+    parser.add_argument("workflow", nargs="?", help="Built-in workflow name or YAML file.")
+    parser.add_argument("title", nargs="?", help="Title for the recording session.")
+    parser.add_argument(
+        "--session", nargs="+", type=Path, metavar="FOLDER",
+        help="Run the stages over these session folders instead of recording.",
+    )
+    parser.add_argument("--list", action="store_true", help="List the built-in workflows and exit.")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="Sessions to process in parallel (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Re-run every stage, ignoring the manifest and the stage cache.",
+    )
+    args, record_args = parser.parse_known_args(argv)
+
+    if args.list:
+        for name, path in builtin_workflows().items():
+            print(f"{name:<14} {load_workflow(str(path)).description}")
+        return
+    if not args.workflow:
+        parser.error("a workflow is required")
+    try:
+        workflow = load_workflow(args.workflow)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.session:
+        if record_args or args.title:
+            parser.error("--session runs existing sessions; it takes no title or record options")
+        sessions = [folder.resolve() for folder in args.session]
+        for folder in sessions:
+            if not reprocess.SESSION_PATTERN.match(folder.name):
+                parser.error(f"{folder} is not a session folder (YY.JJJ.HHMMSS_slug)")
+    else:
+        # the package entry point imports this module, not the other way round
+        from .main import record, record_parser
+
+        if not args.title:
+            parser.error("a title is required to record")
+        folder = record(
+            record_parser(f"capt workflow {args.workflow}"),
+            [args.title, *record_argv(workflow.record), *record_args],
+            post_process=False,
+        )
+        if folder is None:
+            return
+        sessions = [folder.resolve()]
+
+    failed = run_workflow(workflow, sessions, args.jobs, args.force)
+    if failed:
+        print(f"{len(failed)} sessions failed; run again to resume them.")
+        raise SystemExit(1)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+from photon_platform.capture import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(cache.settings, "dir", tmp_path / "cache")
+    monkeypatch.setitem(cache.settings, "force", False)
+    return tmp_path / "cache"
+
+
+def copy_command(source, output):
+    script = "import shutil, sys; shutil.copy(*sys.argv[1:])"
+    return [sys.executable, "-c", script, str(source), str(output)]
+
+
+def test_hit_keeps_output_mtime(tmp_path):
+    source = tmp_path / "in.ogg"
+    source.write_bytes(b"audio")
+    output = tmp_path / "out.ogg"
+    cache.run_cached(copy_command(source, output), [source], output)
+    mtime = output.stat().st_mtime_ns
+
+    output.unlink()
+    cache.run_cached(copy_command(source, output), [source], output)
+    assert output.read_bytes() == b"audio"
+    assert output.stat().st_mtime_ns == mtime
+
+
+def test_evict_least_recently_used(cache_dir):
+    (cache_dir / "aa").mkdir(parents=True)
+    old, new = cache_dir / "aa" / "old.ogg", cache_dir / "aa" / "new.ogg"
+    for atime, path in enumerate((old, new)):
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (atime, 0))
+    cache.evict(max_bytes=10)
+    assert not old.exists() and new.exists()
+
+
+def test_evict_skips_entries_removed_meanwhile(cache_dir, monkeypatch):
+    (cache_dir / "aa").mkdir(parents=True)
+    gone = cache_dir / "aa" / "gone.ogg"
+    gone.write_bytes(b"x")
+    real_glob = type(cache_dir).glob
+
+    def glob_then_remove(self, pattern):
+        found = list(real_glob(self, pattern))
+        gone.unlink()  # another worker evicts it before the stat
+        return found
+
+    monkeypatch.setattr(type(cache_dir), "glob", glob_then_remove)
+    cache.evict(max_bytes=0)
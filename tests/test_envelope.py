@@ -0,0 +1,27 @@
+import numpy as np
+
+from photon_platform.capture import envelope
+
+
+def fake_decode(samples):
+    return lambda file_path, rate=envelope.DEFAULT_RATE: samples
+
+
+def test_load_envelope_maps_sidecar(tmp_path, monkeypatch):
+    audio = tmp_path / "mic.ogg"
+    audio.write_bytes(b"audio")
+    monkeypatch.setattr(envelope, "decode_pcm", fake_decode(np.ones(envelope.DEFAULT_RATE, np.float32)))
+    loaded = envelope.load_envelope(audio)
+    assert len(loaded) == 100
+    assert envelope.is_fresh(audio)
+
+
+def test_load_envelope_of_empty_audio(tmp_path, monkeypatch):
+    audio = tmp_path / "mic.ogg"
+    audio.write_bytes(b"audio")
+    monkeypatch.setattr(envelope, "decode_pcm", fake_decode(np.zeros(0, np.float32)))
+    loaded = envelope.load_envelope(audio)
+    assert loaded.shape == (0,)
+    assert envelope.sidecar_paths(audio)[0].stat().st_size == 0
+    # fresh now, so loading again reads the metadata instead of rebuilding
+    assert envelope.load_envelope(audio).shape == (0,)
@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import pytest
+
+from photon_platform.capture import layout as layout_module
+from photon_platform.capture.layout import CIRCLE, Layout, Tile, compile_layout, layout_inputs
+
+
+def chains(layout, resolution=None) -> list:
+    return compile_layout(layout, resolution).split(";")
+
+
+def test_single_tile():
+    layout = Layout((Tile("screen", 0, 0, 1920, 1080),))
+    assert chains(layout) == [
+        "[0:v]scale=1920:1080[t0]",
+        "color=c=black:s=1920x1080[bg]",
+        "[bg][t0]overlay=shortest=1:x=0:y=0,format=yuv420p[v]",
+    ]
+
+
+def test_inputs_are_sources_then_masks():
+    mask = Path("circle.png")
+    layout = Layout(
+        (
+            Tile("screen", 0, 0, 1920, 1080),
+            Tile("cam", 0, 0, 200, 200, mask=mask),
+            Tile("screen", 0, 0, 10, 10),
+        ),
+        audio=("mic",),
+    )
+    assert layout_inputs(layout) == ["screen", "cam", "mic", mask]
+
+
+def test_reused_streams_are_split():
+    layout = Layout(
+        (
+            Tile("screen", 0, 0, 1920, 1080),
+            Tile("screen", 1600, 800, 320, 180),
+            Tile("mic", 0, 980, 1920, 100, waves="white"),
+        ),
+        audio=("mic",),
+    )
+    graph = chains(layout)
+    assert "[0:v]split=2[t0_in][t1_in]" in graph
+    assert "[1:a]asplit=2[t2_in][mix_1_in]" in graph
+    assert "[t2_in]showwaves=s=1920x200:mode=cline:colors=white,crop=1920:100[t2]" in graph
+    assert graph[-1] == "[mix_1_in]volume=2.0[a]"
+
+
+def test_single_use_streams_are_not_split():
+    layout = Layout((Tile("screen", 0, 0, 1920, 1080),), audio=("mic", "system"))
+    graph = chains(layout)
+    assert not any("split" in chain for chain in graph)
+    assert graph[-1] == "[1:a][2:a]amix=inputs=2:duration=shortest:normalize=0,volume=2.0[a]"
+
+
+def test_masks_are_scaled_once_per_size():
+    mask = Path("circle.png")
+    layout = Layout((Tile("a", 0, 0, 200, 200, mask=mask), Tile("b", 300, 0, 200, 200, mask=mask)))
+    graph = chains(layout)
+    assert "[2:v]scale=200:200,format=gray,split=2[mask0_0][mask0_1]" in graph
+    assert "[t1_raw][mask0_1]alphamerge[t1]" in graph
+    assert sum("scale=200:200,format=gray" in chain for chain in graph) == 1
+
+
+def test_resolution_scales_tiles_to_even_sizes():
+    layout = Layout((Tile("screen", 0, 0, 1920, 1080), Tile("cam", 1501, 801, 301, 171)))
+    graph = chains(layout, (1280, 720))
+    assert "color=c=black:s=1280x720[bg]" in graph
+    assert "[1:v]scale=200:114[t1]" in graph
+    assert graph[-1] == "[bg0][t1]overlay=shortest=1:x=1001:y=534,format=yuv420p[v]"
+
+
+def test_audio_only_layout():
+    assert chains(Layout((), audio=("mic",))) == [
+        "color=c=black:s=1920x1080[bg]",
+        "[bg]format=yuv420p[v]",
+        "[0:a]volume=2.0[a]",
+    ]
+
+
+def test_empty_layout_is_rejected():
+    with pytest.raises(ValueError):
+        compile_layout(Layout(()))
+
+
+def test_circle_masks_are_drawn_not_read():
+    layout = Layout(
+        (Tile("screen", 0, 0, 1920, 1080), Tile("mic", 0, 0, 100, 100, mask=CIRCLE, waves="white")),
+    )
+    assert layout_inputs(layout) == ["screen", "mic"]
+    graph = chains(layout, (960, 540))
+    assert graph[0] == (
+        "color=c=white:s=50x50,format=gray,geq=lum='255*lte(hypot(2*X+1-W,2*Y+1-H),min(W,H))'[mask0]"
+    )
+    assert "[t1_raw][mask0]alphamerge[t1]" in graph
+
+
+def test_render_ends_with_the_audio(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(layout_module, "run_cached", lambda command, inputs, output: commands.append(command))
+    layout_module.render_layout(Layout((), audio=("mic",)), {"mic": "mic.ogg"}, tmp_path / "out.mp4")
+    assert "-shortest" in commands[0]
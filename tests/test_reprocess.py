@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from photon_platform.capture import reprocess
+
+SESSION = "26.291.120000_demo"
+
+
+@pytest.fixture
+def session(tmp_path) -> Path:
+    """
+    A recorded session before any post-processing, without ``proxy.mkv``.
+    """
+    folder = tmp_path / SESSION
+    folder.mkdir()
+    for name in ("mic.ogg", "screen.mkv", "system.ogg"):
+        (folder / name).write_bytes(name.encode())
+    return folder
+
+
+def stale_names(folder, **kwargs) -> list:
+    return [stage.name for stage, _ in reprocess.stale_stages(folder, **kwargs)]
+
+
+def test_fresh_session_runs_default_stages(session):
+    assert stale_names(session) == ["clean", "mux", "envelope", "mlt", "roughcut"]
+
+
+def test_proxy_skipped_after_stale_mux_without_proxy(session):
+    # mux is stale, but proxy.mkv does not exist and no stage makes it
+    assert "proxy" not in stale_names(session, names=("mux", "proxy"))
+    assert "proxy" not in stale_names(session, force=True)
+
+
+def test_proxy_scheduled_after_stale_mux(session):
+    (session / "proxy.mkv").write_bytes(b"proxy")
+    stale = dict((stage.name, reason) for stage, reason in reprocess.stale_stages(session))
+    assert stale["proxy"] == "after mux"
+
+
+def test_dry_run_without_proxy(session, capsys):
+    reprocess.main([str(session.parent), "--dry-run", "--stages", "mux,proxy,mlt"])
+    lines = capsys.readouterr().out.splitlines()
+    # mlt also waits for mic_clean.ogg, which only the clean stage makes
+    assert lines[1:] == [f"{session}: mux (output missing)"]
+
+
+def test_done_stages_are_fresh_until_inputs_change(session):
+    (session / "mic_clean.ogg").write_bytes(b"clean")
+    reprocess.mark_done(session, "clean")
+    assert "clean" not in stale_names(session)
+
+    (session / "mic.ogg").write_bytes(b"re-recorded")
+    stale = dict((stage.name, reason) for stage, reason in reprocess.stale_stages(session))
+    assert stale["clean"] == "inputs or parameters changed"
+    assert stale["envelope"] == "after clean"
+
+
+def test_changed_segment_makes_stage_stale(tmp_path):
+    folder = tmp_path / SESSION
+    (folder / "segments").mkdir(parents=True)
+    segment = folder / "segments" / "mic_00000.ogg"
+    segment.write_bytes(b"first take")
+    (folder / "mic.ffconcat").write_text("ffconcat version 1.0\nfile 'segments/mic_00000.ogg'\n")
+    (folder / "mic_clean.ogg").write_bytes(b"clean")
+    reprocess.mark_done(folder, "clean")
+    assert "clean" not in stale_names(folder)
+
+    segment.write_bytes(b"second take")
+    assert "clean" in stale_names(folder)
+
+
+def test_waves_stage_runs_on_request(session):
+    assert "waves" not in stale_names(session)
+    (session / "mic_clean.ogg").write_bytes(b"clean")
+    assert stale_names(session, names=("waves",)) == ["waves"]
+
+
+def test_waves_resolution_option():
+    assert reprocess.stage_options({"waves": {"resolution": "1280x720"}})["waves"] == {
+        "resolution": "1280x720"
+    }
+    with pytest.raises(ValueError):
+        reprocess.stage_options({"waves": {"resolution": "720p"}})
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from photon_platform.capture.envelope import DEFAULT_RATE, SILENT_DB, rms_envelope
+from photon_platform.capture.silence import silence_segments, speech_segments
+
+RATE = DEFAULT_RATE
+
+
+def tone(duration, spans, amplitude=0.5, noise=0.001):
+    """
+    ``duration`` seconds of faint noise with a 400 Hz tone over ``spans``,
+    four whole cycles per envelope frame.
+    """
+    t = np.arange(int(duration * RATE)) / RATE
+    samples = noise * np.random.default_rng(0).standard_normal(len(t))
+    for start, end in spans:
+        on = (t >= start) & (t < end)
+        samples[on] += amplitude * np.sin(2 * np.pi * 400 * t[on])
+    return samples.astype(np.float32)
+
+
+def test_rms_envelope_levels():
+    samples = np.concatenate([np.zeros(RATE, np.float32), tone(1.0, [(0, 1)], noise=0)])
+    envelope = rms_envelope(samples)
+    assert envelope.shape == (200,)
+    assert np.all(envelope[:100] == SILENT_DB)
+    # a sine's RMS is its amplitude over sqrt(2)
+    assert envelope[100:] == pytest.approx(20 * np.log10(0.5 / np.sqrt(2)), abs=0.05)
+
+
+def test_rms_envelope_pads_partial_frame():
+    envelope = rms_envelope(np.ones(RATE // 100 + RATE // 200, np.float32))
+    assert envelope.tolist() == pytest.approx([0.0, 10 * np.log10(0.5)], abs=1e-4)
+
+
+def test_speech_segments():
+    envelope = rms_envelope(tone(15.0, [(3, 6), (9, 13)]))
+    assert speech_segments(envelope) == [(3.0, 6.0), (9.0, 13.0)]
+
+
+def test_short_pauses_stay_in_speech():
+    envelope = rms_envelope(tone(15.0, [(3, 6), (9, 13)]))
+    assert speech_segments(envelope, min_silence=4.0) == [(0.0, 15.0)]
+    # the trailing two seconds are too short to count as silence
+    assert speech_segments(envelope, min_silence=2.5) == [(3.0, 6.0), (9.0, 15.0)]
+
+
+def test_min_speech_drops_blips():
+    envelope = rms_envelope(tone(15.0, [(3, 6), (9, 9.2)]))
+    assert speech_segments(envelope, min_speech=0.5) == [(3.0, 6.0)]
+
+
+def test_silence_segments():
+    envelope = rms_envelope(tone(15.0, [(3, 6), (9, 13)]))
+    assert silence_segments(envelope) == [(0.0, 3.0), (6.0, 9.0), (13.0, 15.0)]
+
+
+def test_silent_audio():
+    envelope = rms_envelope(tone(5.0, []))
+    assert speech_segments(envelope) == []
+    assert silence_segments(envelope) == [(0.0, 5.0)]
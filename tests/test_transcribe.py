@@ -0,0 +1,37 @@
+import os
+
+from photon_platform.capture.transcribe import model_fingerprint, piece_key
+
+
+def make_model(folder):
+    (folder / "conf").mkdir(parents=True)
+    (folder / "am").mkdir()
+    (folder / "conf" / "model.conf").write_text("--sample-frequency=16000\n")
+    (folder / "am" / "final.mdl").write_bytes(b"weights")
+    (folder / "README").write_text("vosk-model-small-en-us-0.15\n")
+    return folder
+
+
+def test_models_with_the_same_name_differ(tmp_path):
+    small = make_model(tmp_path / "a" / "model")
+    large = make_model(tmp_path / "b" / "model")
+    assert model_fingerprint(small) != model_fingerprint(large)
+
+
+def test_fingerprint_follows_conf_and_weights(tmp_path):
+    model = make_model(tmp_path / "model")
+    first = model_fingerprint(model)
+    assert model_fingerprint(tmp_path / "." / "model") == first
+
+    (model / "conf" / "model.conf").write_text("--sample-frequency=8000\n")
+    second = model_fingerprint(model)
+    assert second != first
+
+    os.utime(model / "am" / "final.mdl", ns=(0, 0))
+    assert model_fingerprint(model) != second
+
+
+def test_piece_key():
+    assert piece_key(b"pcm", "model") == piece_key(b"pcm", "model")
+    assert piece_key(b"pcm", "model") != piece_key(b"pcm", "other")
+    assert piece_key(b"pcm", "model") != piece_key(b"pcn", "model")
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from photon_platform.capture.transcript_index import Span, TranscriptIndex, spans_to_cuts
+from photon_platform.capture.transcribe import transcript_paths
+
+RATE = 16000
+
+
+def timed(words, start, step=0.5):
+    return [
+        {"word": word, "start": start + n * step, "end": start + n * step + 0.4, "conf": 1.0}
+        for n, word in enumerate(words)
+    ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    audio = tmp_path / "mic_clean.ogg"
+    segments = [
+        # the pause before "you" starts a second sentence
+        {"words": timed(["i", "don't", "know", "what"], 1.0) + timed(["you", "know"], 5.0)},
+        {"words": timed(["don't", "stop", "now"], 10.0)},
+    ]
+    transcript_paths(audio)["words"].write_text(json.dumps({"rate": RATE, "segments": segments}))
+    with TranscriptIndex(audio) as index:
+        yield index
+
+
+def texts(spans) -> list:
+    return [span.text for span in spans]
+
+
+def test_sentences(index):
+    assert texts(index.sentences()) == ["i don't know what", "you know", "don't stop now"]
+    assert texts(index.sentences(4.0, 6.0)) == ["you know"]
+
+
+def test_search(index):
+    assert texts(index.search("know")) == ["know", "know"]
+    assert [(s.first, s.last) for s in index.search("Know what?")] == [(3, 4)]
+    assert index.search("what you") == []  # across sentences
+
+
+def test_search_contractions(index):
+    found = index.search("don't know")
+    assert texts(found) == ["don't know"]
+    assert (found[0].first, found[0].last) == (2, 3)
+    assert texts(index.search("DON'T")) == ["don't", "don't"]
+    assert texts(index.search("don't", limit=1)) == ["don't"]
+    # only whole words match
+    assert index.search("don") == []
+
+
+def test_time_lookups(index):
+    assert index.at(1.6).text == "don't"
+    assert index.at(1.95) is None  # between words
+    assert texts(index.words(5.2, 5.6)) == ["you", "know"]
+    assert index.seconds(index.at(10.0).start) == 10.0
+
+
+def test_keep_except(index):
+    kept = index.keep_except(index.search("don't know") + index.search("stop"))
+    assert texts(kept) == ["i", "what", "you know", "don't", "now"]
+    assert [(span.start / RATE, span.stop / RATE) for span in kept[:2]] == [(1.0, 1.4), (2.5, 2.9)]
+
+
+def test_rebuilt_when_transcript_changes(index):
+    words_file = transcript_paths(index.audio_file)["words"]
+    words_file.write_text(json.dumps({"rate": RATE, "segments": [{"words": timed(["again"], 0.0)}]}))
+    with TranscriptIndex(index.audio_file) as rebuilt:
+        assert texts(rebuilt.sentences()) == ["again"]
+
+
+def test_spans_to_cuts():
+    # out of order, the last two overlapping once padded
+    spans = [
+        Span(3, 3, 2 * RATE, 3 * RATE, "b"),
+        Span(1, 1, 0, RATE, "a"),
+        Span(4, 4, 31 * RATE // 10, 4 * RATE, "c"),
+    ]
+    assert spans_to_cuts(spans, RATE, 25, padding=0.1) == [(0, 27), (48, 101)]